@@ -13,6 +13,7 @@ import atexit
 import collections
 import concurrent.futures
 import contextlib
+import functools
 import json
 import logging
 import os
@@ -43,7 +44,7 @@ from flask import (
     Flask, abort, jsonify, render_template, request, Response, stream_with_context,
 )
 
-from config import Config, _BITRATE_RE
+from config import Config, _BITRATE_RE, _BOT_TOKEN_RE, _parse_bool, is_valid_file_id
 from stream_analyzer import analyze
 from video_processor import process, cleanup, transcode_segment
 from telegram_uploader import TelegramUploader, UploadResult
@@ -77,6 +78,7 @@ _upload_locks = {}
 _last_pending_cleanup = 0.0
 _watcher_started = False
 _folder_watcher_started = False
+_watch_wake_event = threading.Event()  # set to run the next watch scan immediately
 _watch_state_lock = Lock()
 _watch_candidates = {}
 _watch_claimed_paths = set()
@@ -229,11 +231,20 @@ def _is_trusted_proxy(remote_addr):
         remote_ip = ipaddress.ip_address(remote_addr)
     except ValueError:
         return False
-    for cidr in Config.TRUSTED_PROXY_CIDRS:
+    return any(
+        remote_ip in network
+        for network in _parse_trusted_proxy_networks(tuple(Config.TRUSTED_PROXY_CIDRS))
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_trusted_proxy_networks(cidrs):
+    """Parse TRUSTED_PROXY_CIDRS once per distinct setting value; invalid entries are skipped."""
+    networks = []
+    for cidr in cidrs:
         with contextlib.suppress(ValueError):
-            if remote_ip in ipaddress.ip_network(cidr, strict=False):
-                return True
-    return False
+            networks.append(ipaddress.ip_network(cidr, strict=False))
+    return tuple(networks)
 
 
 def _check_rate_limit():
@@ -273,6 +284,13 @@ _job_queue = queue.Queue()
 _queue_order = []         # ordered list of job_ids waiting to be processed
 _queue_order_lock = Lock()
 _queue_workers_started = False
+# Bounds concurrent encodes to MAX_CONCURRENT_JOBS. Workers hold a slot only
+# while ffmpeg runs, so another job can encode while one finishes uploading.
+_encode_slots = threading.BoundedSemaphore(max(1, Config.MAX_CONCURRENT_JOBS))
+# The watcher stops claiming files once this many jobs per encode slot
+# (MAX_CONCURRENT_JOBS) are waiting; the rest stay on disk and are picked up
+# by later scans.
+_WATCH_BACKLOG_PER_ENCODE_SLOT = 4
 
 
 def _get_base_url():
@@ -341,7 +359,7 @@ def _normalize_watch_settings(data=None):
     data = data or {}
     watch_enabled = data.get("watch_enabled", Config.WATCH_ENABLED)
     if isinstance(watch_enabled, str):
-        watch_enabled = watch_enabled.strip().lower() in {"1", "true", "yes", "on"}
+        watch_enabled = _parse_bool(watch_enabled)
     else:
         watch_enabled = bool(watch_enabled)
 
@@ -376,8 +394,24 @@ def _current_watch_settings():
 
 
 def _persist_watch_settings(settings):
-    with open(_WATCH_SETTINGS_PATH, "w", encoding="utf-8") as handle:
-        json.dump(settings, handle, indent=2, sort_keys=True)
+    # Serialize up front and swap a fsynced, uniquely named temp file into place,
+    # so a crash or a concurrent save never leaves a half-written settings file.
+    payload = json.dumps(settings, indent=2, sort_keys=True)
+    temp_fd, temp_path = tempfile.mkstemp(
+        prefix="watch_settings-", suffix=".tmp", dir=os.path.dirname(_WATCH_SETTINGS_PATH),
+    )
+    try:
+        with os.fdopen(temp_fd, "w", encoding="utf-8") as handle:
+            handle.write(payload)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_path, _WATCH_SETTINGS_PATH)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
 
 
 def _apply_watch_settings(data=None, *, persist=False):
@@ -390,6 +424,8 @@ def _apply_watch_settings(data=None, *, persist=False):
     Config.WATCH_ROOT = settings["watch_root"]
     Config.WATCH_DONE_DIR = settings["watch_done_dir"]
 
+    # Always re-run makedirs here: a watch folder deleted while the server runs
+    # is recreated the next time settings are saved.
     if Config.WATCH_ROOT:
         os.makedirs(Config.WATCH_ROOT, exist_ok=True)
     if Config.WATCH_DONE_DIR:
@@ -431,8 +467,16 @@ _scheduled_segment_prefetches = set()
 _segment_prefetch_lock = Lock()
 _virtual_segment_futures = {}
 _virtual_segment_futures_lock = Lock()
-_last_player_segment = {}          # (job_id, prefix) -> segment_key
+# (job_id, prefix) -> segment_key, in least-recently-played order. Capped so a
+# long-running server does not keep one entry for every stream ever watched.
+_LAST_PLAYER_SEGMENT_MAX = 1024
+_last_player_segment = collections.OrderedDict()
 _last_player_segment_lock = Lock()
+# Prefetch schedulers run on every segment request; a stream's segment list is
+# fixed once its job completes, so it is read from SQLite at most once per TTL.
+_PREFETCH_SEGMENT_LIST_TTL_SECONDS = 30
+_prefetch_segment_lists = {}       # (job_id, prefix) -> (loaded_at, segments, positions)
+_prefetch_segment_lists_lock = Lock()
 
 _STREAM_EOF = object()
 
@@ -664,7 +708,8 @@ def _start_folder_watcher():
                 _watch_scan_once()
             except Exception:
                 logger.exception("Watch-folder scan failed")
-            time.sleep(Config.WATCH_POLL_SECONDS)
+            _watch_wake_event.wait(Config.WATCH_POLL_SECONDS)
+            _watch_wake_event.clear()
 
     Thread(target=watch, daemon=True, name="folder-watcher").start()
 
@@ -696,7 +741,9 @@ def _start_queue_workers():
                 db.close_conn()
                 _job_queue.task_done()
 
-    n_workers = max(1, Config.MAX_CONCURRENT_JOBS)
+    # Twice the encode slots: one set of jobs encodes while the previous set
+    # drains its remaining Telegram uploads.
+    n_workers = 2 * max(1, Config.MAX_CONCURRENT_JOBS)
     for _ in range(n_workers):
         Thread(target=worker, daemon=True).start()
     logger.info("Started %d job queue worker(s)", n_workers)
@@ -761,18 +808,10 @@ def cancel_job(job_id):
 @app.route("/api/jobs/<job_id>", methods=["GET"])
 def get_job_endpoint(job_id):
     """Return metadata for a single job including track counts."""
-    conn = db._get_conn()
-    rows = conn.execute(
-        """SELECT j.*,
-               (SELECT COUNT(*) FROM tracks t WHERE t.job_id = j.job_id AND t.track_type = 'audio') as audio_count,
-               (SELECT COUNT(*) FROM tracks t WHERE t.job_id = j.job_id AND t.track_type = 'subtitle') as subtitle_count,
-               (SELECT COUNT(*) FROM segments s WHERE s.job_id = j.job_id) as segment_count
-           FROM jobs j WHERE j.job_id = ?""",
-        (job_id,),
-    ).fetchall()
-    if not rows:
+    job = db.get_job_with_counts(job_id)
+    if not job:
         return jsonify({"error": "Job not found"}), 404
-    return jsonify(dict(rows[0]))
+    return jsonify(job)
 
 
 @app.route("/api/jobs/<job_id>", methods=["DELETE"])
@@ -787,6 +826,7 @@ def delete_job_endpoint(job_id):
         return jsonify({"error": "Job not found"}), 404
 
     db.delete_job(job_id)
+    _forget_prefetch_segments(job_id)
     logger.info("Job %s deleted by user", job_id)
     return jsonify({"message": "Job deleted"})
 
@@ -1085,10 +1125,8 @@ def watch_settings():
 
     if settings["watch_enabled"]:
         _start_folder_watcher()
-        try:
-            _watch_scan_once()
-        except Exception:
-            logger.exception("Initial watch-folder scan failed after settings update")
+        # Scan on the watcher thread rather than walking the tree inside the request.
+        _watch_wake_event.set()
     return jsonify(settings)
 
 
@@ -1106,11 +1144,10 @@ def api_settings():
         return jsonify({"error": "Expected {settings: {KEY: value}}"}), 400
 
     allowed_keys = Config.setting_type_map()
-    known_setting_keys = set(Config.setting_type_map().keys())
     changed_runtime = {}
     validated_for_db = {}
     for key, raw_value in incoming.items():
-        if key not in allowed_keys or key not in known_setting_keys:
+        if key not in allowed_keys:
             return jsonify({"error": f"Unknown setting: {key!r}"}), 400
         try:
             parsed = Config.parse_setting_value(key, raw_value)
@@ -1142,10 +1179,9 @@ def api_settings_reset():
     """Delete a setting from DB so it reverts to .env/default."""
     data = request.get_json() or {}
     key = data.get("key", "")
-    allowed_keys = {entry[0] for entry in Config.CONFIGURABLE_SETTINGS}
+    allowed_keys = Config.setting_type_map()
     if key == "*":
-        for k in allowed_keys:
-            db.delete_setting(k)
+        db.delete_settings(allowed_keys)
     elif key in allowed_keys:
         db.delete_setting(key)
     else:
@@ -1173,6 +1209,7 @@ def api_database_load():
 
         result = db.replace_database_file(temp_path)
         temp_path = None
+        _forget_prefetch_segments()
         Config.reload()
         _telegram_uploader.reload_bots()
         return jsonify({
@@ -1245,7 +1282,6 @@ def api_bots_health():
 @app.route("/api/bots/add", methods=["POST"])
 def api_bots_add():
     """Validate, test, and add a new Telegram bot."""
-    import re as _re  # noqa: PLC0415
     from telegram import Bot as _Bot  # noqa: PLC0415
     from telegram.request import HTTPXRequest as _HTTPXRequest  # noqa: PLC0415
 
@@ -1254,8 +1290,7 @@ def api_bots_add():
     channel_raw = str(data.get("channel_id", "")).strip()
     label = str(data.get("label", "")).strip()
 
-    token_pattern = _re.compile(r"^[0-9]{8,12}:[a-zA-Z0-9_-]{35,45}$")
-    if not token_pattern.match(token):
+    if not _BOT_TOKEN_RE.match(token):
         return jsonify({"error": "Invalid token format. Expected: 123456789:ABCdef..."}), 400
 
     try:
@@ -1336,7 +1371,7 @@ def _import_db_from_telegram(file_id: str, bot_index: int) -> dict:
     """Download an export JSON from Telegram, validate it, and merge it."""
     try:
         data = _run_async(_telegram_uploader.get_file_bytes(file_id, bot_index), timeout=120)
-        exported = json.loads(bytes(data).decode("utf-8"))
+        exported = json.loads(data.decode("utf-8"))
     except Exception as exc:  # noqa: BLE001
         logger.exception("Database import download/parse failed: %s", exc)
         raise RuntimeError("Failed to download or parse import payload") from exc
@@ -1407,7 +1442,7 @@ def _start_db_auto_merge_worker():
                 time.sleep(sleep_seconds)
                 continue
 
-            if not re.match(r"^[a-zA-Z0-9_-]{50,255}$", file_id):
+            if not is_valid_file_id(file_id):
                 logger.warning("Auto DB merge skipped: invalid DB_AUTO_MERGE_FILE_ID format")
                 time.sleep(sleep_seconds)
                 continue
@@ -1455,16 +1490,17 @@ def api_db_export():
     if not Config.BOTS:
         return jsonify({"error": "No Telegram bots configured."}), 503
     try:
-        snapshot = db.export_to_dict()
-        payload = {
+        tables = db.export_tables_json()
+        header = json.dumps({
             "version": 1,
             "exported_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
             "bot_fingerprints": _bot_fingerprints(Config.BOTS),
-            "jobs": snapshot["jobs"],
-            "tracks": snapshot["tracks"],
-            "segments": snapshot["segments"],
-        }
-        export_bytes = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        }, separators=(",", ":"), ensure_ascii=False)
+        # Splice the table arrays SQLite already encoded into the header object.
+        export_text = header[:-1] + "".join(
+            f',"{name}":{array_json}' for name, (array_json, _) in tables.items()
+        ) + "}"
+        export_bytes = export_text.encode("utf-8")
         uploaded = _run_async(
             _telegram_uploader.upload_document(export_bytes, "db_export.json"),
             timeout=120,
@@ -1472,8 +1508,8 @@ def api_db_export():
         return jsonify({
             "file_id": uploaded["file_id"],
             "bot_index": uploaded["bot_index"],
-            "job_count": len(snapshot["jobs"]),
-            "segment_count": len(snapshot["segments"]),
+            "job_count": tables["jobs"][1],
+            "segment_count": tables["segments"][1],
             "size_bytes": len(export_bytes),
         })
     except Exception as exc:  # noqa: BLE001
@@ -1488,7 +1524,7 @@ def api_db_import():
     file_id = str(body.get("file_id", "")).strip()
     bot_index = body.get("bot_index")
 
-    if not re.match(r"^[a-zA-Z0-9_-]{50,255}$", file_id):
+    if not is_valid_file_id(file_id):
         return jsonify({"error": "Invalid or malformed Telegram file_id"}), 400
     try:
         bot_index = int(bot_index)
@@ -1743,9 +1779,13 @@ def _decrement_pending_uploads_for_ip(ip):
 
 def _queue_local_file(file_path, *, filename=None, source_mode="upload", skip_disk_check=False,
                       media_type=None, series_name=None,
-                      is_series=None, season_number=None, episode_number=None, part_number=None):
-    """Queue an existing local file for processing via the shared job pipeline."""
-    actual_size = os.path.getsize(file_path)
+                      is_series=None, season_number=None, episode_number=None, part_number=None,
+                      file_size=None):
+    """Queue an existing local file for processing via the shared job pipeline.
+
+    Callers that have just stat'ed the file pass ``file_size`` to skip a second stat.
+    """
+    actual_size = os.path.getsize(file_path) if file_size is None else file_size
     if not skip_disk_check:
         ok, msg = _check_disk_space(actual_size)
         if not ok:
@@ -1797,61 +1837,88 @@ def _watch_file_signature(path):
         stat_result = os.stat(path)
     except OSError:
         return None
+    return _stat_signature(stat_result)
+
+
+def _stat_signature(stat_result):
     return stat_result.st_size, stat_result.st_mtime_ns
 
 
 def _is_supported_watch_video(path):
-    return os.path.splitext(path)[1].lower() in Config.WATCH_VIDEO_EXTENSIONS
+    # Config normalizes extensions to lowercase ".ext", so one endswith covers them all.
+    return path.lower().endswith(Config.WATCH_VIDEO_EXTENSIONS)
 
 
 def _is_ignored_watch_path(path):
     name = os.path.basename(path).lower()
-    if name.startswith("."):
-        return True
-    return any(name.endswith(suffix) for suffix in Config.WATCH_IGNORE_SUFFIXES)
+    return name.startswith(".") or name.endswith(Config.WATCH_IGNORE_SUFFIXES)
 
 
 def _iter_watch_video_files():
-    """Yield supported video files under the watched root, excluding done/ and temp files."""
+    """Yield ``(path, signature)`` for supported videos under the watched root.
+
+    Walks with os.scandir so name-based filters run on each entry before any
+    stat, and only files that pass them are checked and resolved. The
+    signature comes from DirEntry.stat(), which reuses the stat done by
+    is_file() where the filesystem lacks d_type (and is free on Windows).
+    Like os.walk, symlinked directories are listed but not descended into;
+    done/ and temp files are skipped.
+    """
     root = _normalize_watch_path(Config.WATCH_ROOT)
     done_dir = _normalize_watch_path(Config.WATCH_DONE_DIR)
-    for dirpath, dirnames, filenames in os.walk(root):
-        norm_dir = _normalize_watch_path(dirpath)
-        if _path_is_within(norm_dir, done_dir):
+    if _path_is_within(root, done_dir):
+        return
+
+    stack = [root]
+    while stack:
+        dirpath = stack.pop()
+        subdirs = []
+        matches = []
+        try:
+            with os.scandir(dirpath) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            if not entry.is_symlink() and not _path_is_within(entry.path, done_dir):
+                                subdirs.append(entry.path)
+                            continue
+                        if _is_ignored_watch_path(entry.name) or not _is_supported_watch_video(entry.name):
+                            continue
+                        if entry.is_file():
+                            # dirpath is already resolved (root is normalized and
+                            # symlinked dirs are never entered), so only a
+                            # symlinked file itself needs realpath's per-component lstats.
+                            path = _normalize_watch_path(entry.path) if entry.is_symlink() else entry.path
+                            matches.append((path, _stat_signature(entry.stat())))
+                    except OSError:
+                        continue
+        except OSError:
             continue
 
-        kept_dirs = []
-        for dirname in dirnames:
-            child_path = _normalize_watch_path(os.path.join(dirpath, dirname))
-            if _path_is_within(child_path, done_dir):
-                continue
-            kept_dirs.append(dirname)
-        dirnames[:] = kept_dirs
+        # Entries are yielded after the directory handle is closed; reversing
+        # keeps os.walk's top-down, listing-order traversal.
+        stack.extend(reversed(subdirs))
+        yield from matches
 
-        for filename in filenames:
-            path = os.path.join(dirpath, filename)
-            if _is_ignored_watch_path(path):
-                continue
-            if not os.path.isfile(path):
-                continue
-            if not _is_supported_watch_video(path):
-                continue
-            yield _normalize_watch_path(path)
 
+def _claim_watch_file_if_stable(path, signature=None):
+    """Claim a watched file once it has stopped changing for the quiet period.
 
-def _claim_watch_file_if_stable(path):
-    """Claim a watched file once it has stopped changing for the quiet period."""
-    signature = _watch_file_signature(path)
+    ``signature`` may be passed when the caller has just stat'ed the file.
+    Returns the file's ``(size, mtime_ns)`` signature when claimed, else None.
+    """
+    if signature is None:
+        signature = _watch_file_signature(path)
     if signature is None:
         with _watch_state_lock:
             _watch_candidates.pop(path, None)
             _watch_failed_signatures.pop(path, None)
-        return False
+        return None
     with _watch_state_lock:
         if path in _watch_claimed_paths:
-            return False
+            return None
         if _watch_failed_signatures.get(path) == signature:
-            return False
+            return None
 
         now = time.time()
         entry = _watch_candidates.get(path)
@@ -1860,15 +1927,15 @@ def _claim_watch_file_if_stable(path):
                 "signature": signature,
                 "stable_since": now,
             }
-            return False
+            return None
 
         if now - entry["stable_since"] < Config.WATCH_STABLE_SECONDS:
-            return False
+            return None
 
         _watch_claimed_paths.add(path)
         _watch_candidates.pop(path, None)
         _watch_failed_signatures.pop(path, None)
-        return True
+        return signature
 
 
 def _release_watch_file(path, *, success):
@@ -1927,18 +1994,24 @@ def _watch_scan_once():
         return []
 
     queued = []
-    for path in _iter_watch_video_files():
+    max_backlog = max(1, Config.MAX_CONCURRENT_JOBS) * _WATCH_BACKLOG_PER_ENCODE_SLOT
+    for path, scanned_signature in _iter_watch_video_files():
+        if _job_queue.qsize() >= max_backlog:
+            logger.debug("Watcher deferring remaining files: %d jobs already queued", max_backlog)
+            break
         try:
-            if not _claim_watch_file_if_stable(path):
-                continue
+            signature = _claim_watch_file_if_stable(path, scanned_signature)
         except OSError:
             continue
+        if signature is None:
+            continue
 
         try:
             job_id, _ = _queue_local_file(
                 path,
                 filename=os.path.basename(path),
                 source_mode="watch",
+                file_size=signature[0],
             )
         except Exception as exc:
             logger.warning("Watcher could not queue %s: %s", path, exc)
@@ -2016,6 +2089,7 @@ def upload_finalize():
             season_number=season_number,
             episode_number=episode_number,
             part_number=part_number,
+            file_size=actual_size,
         )
         removed = _remove_pending_upload(upload_id)
         if removed is None:
@@ -2188,15 +2262,27 @@ def _process_job(job_id, file_path):
                 _batch_futures.append(future)
                 _prev_upload_future[0] = future
 
-        result = process(
-            analysis,
-            job_id,
-            progress_callback=on_process_progress,
-            cancel_event=runtime.cancel_event,
-            on_process_start=lambda proc: _set_job_process(job_id, proc),
-            on_process_end=lambda proc: _clear_job_process(job_id, proc),
-            on_stream_encoded=on_stream_encoded,
-        )
+        if not _encode_slots.acquire(blocking=False):
+            with _job_status_lock:
+                _active_jobs[job_id]["step"] = "Waiting for an encoder slot..."
+            # Poll so a cancelled or timed-out job frees its worker promptly.
+            while not _encode_slots.acquire(timeout=1):
+                if _is_job_cancelled(job_id):
+                    return
+        try:
+            if _is_job_cancelled(job_id):
+                return
+            result = process(
+                analysis,
+                job_id,
+                progress_callback=on_process_progress,
+                cancel_event=runtime.cancel_event,
+                on_process_start=lambda proc: _set_job_process(job_id, proc),
+                on_process_end=lambda proc: _clear_job_process(job_id, proc),
+                on_stream_encoded=on_stream_encoded,
+            )
+        finally:
+            _encode_slots.release()
         if _is_job_cancelled(job_id):
             return
 
@@ -2449,47 +2535,26 @@ class _SegmentCache:
 
     def get(self, key):
         with self._lock:
-            if key not in self._data:
+            data = self._data.get(key)
+            if data is None:
                 self._misses += 1
                 return None
             self._hits += 1
             self._data.move_to_end(key)
-            return self._data[key]
+            return data
 
     def put(self, key, data):
         size = len(data)
         if self._max_bytes == 0 or size > self._max_bytes:
             return
 
-        keys_to_evict = []
-        with self._lock:
-            current_bytes = self._current_bytes
-            existing = self._data.get(key)
-            if existing is not None:
-                current_bytes -= len(existing)
-
-            projected = current_bytes + size
-            if projected > self._max_bytes:
-                for candidate_key, candidate_value in self._data.items():
-                    if candidate_key == key:
-                        continue
-                    keys_to_evict.append(candidate_key)
-                    projected -= len(candidate_value)
-                    if projected <= self._max_bytes:
-                        break
-
+        # One critical section: drop any previous copy of the key, then evict
+        # least-recently-used entries until the new one fits.
         with self._lock:
             existing = self._data.pop(key, None)
             if existing is not None:
                 self._current_bytes -= len(existing)
 
-            for evict_key in keys_to_evict:
-                evicted = self._data.pop(evict_key, None)
-                if evicted is None:
-                    continue
-                self._current_bytes -= len(evicted)
-                self._evictions += 1
-
             while self._current_bytes + size > self._max_bytes and self._data:
                 _, evicted = self._data.popitem(last=False)
                 self._current_bytes -= len(evicted)
@@ -2537,9 +2602,8 @@ _transcode_semaphore = threading.Semaphore(Config.MAX_PARALLEL_ENCODES)
 
 def _get_segment_prefix(segment_key):
     """Extract the HLS stream prefix from a segment key."""
-    if "/" not in segment_key:
-        return None
-    return segment_key.split("/", 1)[0]
+    prefix, sep, _ = segment_key.partition("/")
+    return prefix if sep else None
 
 
 def _claim_segment_download(cache_key, *, enable_stream=False):
@@ -2578,15 +2642,42 @@ def _release_segment_download(state):
 
 
 def _enqueue_stream_item(stream_queue, stream_abandoned, item):
-    """Enqueue a stream item with bounded backpressure and disconnect awareness."""
+    """Enqueue a stream item with bounded backpressure and disconnect awareness.
+
+    Blocks while the queue is full instead of polling; a consumer that goes
+    away drains the queue in _abandon_stream(), which wakes a blocked put.
+    """
+    if stream_abandoned.is_set():
+        return False
+    stream_queue.put(item)
+    return True
+
+
+def _abandon_stream(state):
+    """Mark the stream consumer gone and drain queued items to unblock the producer."""
+    state.stream_abandoned.set()
     while True:
-        if stream_abandoned.is_set():
-            return False
         try:
-            stream_queue.put(item, timeout=0.1)
-            return True
-        except queue.Full:
-            continue
+            state.stream_queue.get_nowait()
+        except queue.Empty:
+            return
+
+
+async def _enqueue_stream_item_async(state, item):
+    """Enqueue a stream item from the event loop, hopping to a thread only when full.
+
+    The bounded queue usually has room, so the common case is a put_nowait on the
+    loop thread instead of a default-executor round trip per chunk.
+    """
+    if state.stream_abandoned.is_set():
+        return False
+    try:
+        state.stream_queue.put_nowait(item)
+        return True
+    except queue.Full:
+        return await asyncio.to_thread(
+            _enqueue_stream_item, state.stream_queue, state.stream_abandoned, item,
+        )
 
 
 def _cache_segment_from_file(cache_key, temp_path):
@@ -2631,16 +2722,10 @@ async def _download_segment_to_state(file_id, bot_index, cache_key, state):
                     wrote_any = True
                     handle.write(chunk)
                     if state.stream_queue is not None:
-                        await asyncio.to_thread(
-                            _enqueue_stream_item,
-                            state.stream_queue,
-                            state.stream_abandoned,
-                            chunk,
-                        )
-                    else:
-                        # Yield to event loop between chunks so concurrent prefetch
-                        # downloads can interleave fairly on the same asyncio loop.
-                        await asyncio.sleep(0)
+                        await _enqueue_stream_item_async(state, chunk)
+                    # Yield to event loop between chunks so concurrent prefetch
+                    # downloads can interleave fairly on the same asyncio loop.
+                    await asyncio.sleep(0)
 
         if not wrote_any:
             raise RuntimeError(f"Empty Telegram response for {cache_key}")
@@ -2649,22 +2734,12 @@ async def _download_segment_to_state(file_id, bot_index, cache_key, state):
     except asyncio.CancelledError as exc:
         state.error = exc
         if state.stream_queue is not None:
-            await asyncio.to_thread(
-                _enqueue_stream_item,
-                state.stream_queue,
-                state.stream_abandoned,
-                _SegmentStreamError(exc),
-            )
+            await _enqueue_stream_item_async(state, _SegmentStreamError(exc))
         raise
     except Exception as exc:
         state.error = exc
         if state.stream_queue is not None:
-            await asyncio.to_thread(
-                _enqueue_stream_item,
-                state.stream_queue,
-                state.stream_abandoned,
-                _SegmentStreamError(exc),
-            )
+            await _enqueue_stream_item_async(state, _SegmentStreamError(exc))
     finally:
         if state.error is not None and state.temp_path:
             try:
@@ -2677,12 +2752,7 @@ async def _download_segment_to_state(file_id, bot_index, cache_key, state):
                 state.temp_path = None
 
         if state.stream_queue is not None and state.error is None:
-            await asyncio.to_thread(
-                _enqueue_stream_item,
-                state.stream_queue,
-                state.stream_abandoned,
-                _STREAM_EOF,
-            )
+            await _enqueue_stream_item_async(state, _STREAM_EOF)
         state.completed.set()
         _release_segment_download(state)
 
@@ -2702,24 +2772,74 @@ async def _fetch_segment_bytes(file_id, bot_index, cache_key):
     If the segment is already in the LRU cache the download is skipped entirely.
     """
     cached = _segment_cache.get(cache_key)
-    if cached:
+    if cached is not None:
         return cached
     session = await _get_or_create_aiohttp_session()
     url = await _telegram_uploader.get_file_url(file_id, bot_index)
-    buf = bytearray()
+    chunks = []
     async with session.get(url) as resp:
         if resp.status != 200:
             raise RuntimeError(f"Telegram HTTP {resp.status} for {cache_key}")
         async for chunk in resp.content.iter_chunked(65536):
             if chunk:
-                buf.extend(chunk)
-    data = bytes(buf)
+                chunks.append(chunk)
+    # A single join copies each chunk once; a growing bytearray plus bytes()
+    # would copy the whole segment again at the end.
+    data = b"".join(chunks)
     if not data:
         raise RuntimeError(f"Empty Telegram response for {cache_key}")
     _segment_cache.put(cache_key, data)
     return data
 
 
+def _record_player_segment(job_id, prefix, segment_key):
+    """Remember the segment a player last requested, evicting the stalest stream."""
+    key = (job_id, prefix)
+    with _last_player_segment_lock:
+        _last_player_segment[key] = segment_key
+        _last_player_segment.move_to_end(key)
+        while len(_last_player_segment) > _LAST_PLAYER_SEGMENT_MAX:
+            _last_player_segment.popitem(last=False)
+
+
+def _get_prefetch_segments(job_id, prefix):
+    """Return ``(segments, positions)`` for a stream, reusing a recent read from SQLite.
+
+    ``segments`` is the sorted segment list and ``positions`` maps each
+    segment_key to its index, so schedulers find the player's position in O(1).
+    """
+    key = (job_id, prefix)
+    now = time.monotonic()
+    with _prefetch_segment_lists_lock:
+        entry = _prefetch_segment_lists.get(key)
+    if entry is not None and now - entry[0] < _PREFETCH_SEGMENT_LIST_TTL_SECONDS:
+        return entry[1], entry[2]
+
+    segments = db.get_segments_for_prefix(job_id, prefix)
+    positions = {segment["segment_key"]: index for index, segment in enumerate(segments)}
+    with _prefetch_segment_lists_lock:
+        # Inserts happen at most once per stream per TTL, so sweeping expired
+        # entries here keeps the map bounded by the streams watched recently.
+        for stale_key in [
+            k for k, (loaded_at, _, _) in _prefetch_segment_lists.items()
+            if now - loaded_at >= _PREFETCH_SEGMENT_LIST_TTL_SECONDS
+        ]:
+            del _prefetch_segment_lists[stale_key]
+        if segments:
+            _prefetch_segment_lists[key] = (now, segments, positions)
+    return segments, positions
+
+
+def _forget_prefetch_segments(job_id=None):
+    """Drop cached segment lists for one job, or for all jobs when job_id is None."""
+    with _prefetch_segment_lists_lock:
+        if job_id is None:
+            _prefetch_segment_lists.clear()
+            return
+        for key in [key for key in _prefetch_segment_lists if key[0] == job_id]:
+            del _prefetch_segment_lists[key]
+
+
 def _claim_segment_prefetch(cache_key):
     """Reserve a future segment for one queued prefetch task."""
     with _segment_prefetch_lock:
@@ -2800,7 +2920,7 @@ def _stream_segment_owner(state, first_item):
             yield item
             item = state.stream_queue.get()
     finally:
-        state.stream_abandoned.set()
+        _abandon_stream(state)
         _release_segment_download(state)
 
 
@@ -2862,7 +2982,10 @@ async def _batch_prefetch(segments, allow_chain=False):
             with _last_player_segment_lock:
                 player_seg = _last_player_segment.get((job_id, prefix))
             if player_seg:
-                _schedule_segment_prefetch(job_id, player_seg, _from_chain=True)
+                # Scheduling reads the segment list from SQLite; keep it off the loop.
+                await asyncio.to_thread(
+                    _schedule_segment_prefetch, job_id, player_seg, _from_chain=True
+                )
 
 
 def _start_batch_prefetch(segments, allow_chain=False):
@@ -2889,16 +3012,8 @@ def _schedule_segment_prefetch(job_id, segment_key, *, _from_chain=False):
     if not prefix or not prefix.startswith("video") or not segment_key.endswith(".ts"):
         return
 
-    segments = db.get_segments_for_prefix(job_id, prefix)
-    if not segments:
-        return
-
-    current_index = None
-    for index, segment in enumerate(segments):
-        if segment["segment_key"] == segment_key:
-            current_index = index
-            break
-
+    segments, positions = _get_prefetch_segments(job_id, prefix)
+    current_index = positions.get(segment_key)
     if current_index is None:
         return
 
@@ -2957,14 +3072,14 @@ async def _build_virtual_segment(job_id, segment_key, target_height, tier_bitrat
         raise _VirtualSegmentNotFoundError("Invalid virtual segment key")
 
     tier0_key = f"video_0/{filename}"
-    info = get_segment_info(job_id, tier0_key)
+    info = await asyncio.to_thread(get_segment_info, job_id, tier0_key)
     if not info:
         raise _VirtualSegmentNotFoundError(f"Tier-0 segment not found: {tier0_key}")
 
+    # _fetch_segment_bytes serves tier 0 from the LRU when present, so the cache
+    # is consulted once and a miss is not counted twice.
     tier0_cache_key = f"{job_id}/{tier0_key}"
-    tier0_bytes = _segment_cache.get(tier0_cache_key)
-    if tier0_bytes is None:
-        tier0_bytes = await _fetch_segment_bytes(info["file_id"], info["bot_index"], tier0_cache_key)
+    tier0_bytes = await _fetch_segment_bytes(info["file_id"], info["bot_index"], tier0_cache_key)
 
     acquired = await asyncio.to_thread(_transcode_semaphore.acquire, timeout=30)
     if not acquired:
@@ -3019,16 +3134,8 @@ def _schedule_virtual_segment_prefetch(job_id, segment_key, *, _from_chain=False
     if tier_bitrate is None:
         return
 
-    segments = db.get_segments_for_prefix(job_id, "video_0")
-    if not segments:
-        return
-
-    current_index = None
-    for index, segment in enumerate(segments):
-        if segment["segment_key"].split("/", 1)[-1] == filename:
-            current_index = index
-            break
-
+    segments, positions = _get_prefetch_segments(job_id, "video_0")
+    current_index = positions.get(f"video_0/{filename}")
     if current_index is None:
         return
 
@@ -3103,14 +3210,14 @@ def serve_thumbnail(job_id):
     coro = _telegram_uploader.get_file_bytes(info["file_id"], info["bot_index"])
     future = asyncio.run_coroutine_threadsafe(coro, _async_loop)
     try:
-        data = future.result(timeout=30)
+        data = bytes(future.result(timeout=30))
     except Exception as exc:
         logger.warning("Thumbnail download failed for %s: %s", job_id, exc)
         return jsonify({"error": "Failed to fetch thumbnail"}), 502
 
-    _segment_cache.put(cache_key, bytes(data))
+    _segment_cache.put(cache_key, data)
     return Response(
-        bytes(data),
+        data,
         content_type="image/jpeg",
         headers={"Cache-Control": "public, max-age=604800"},
     )
@@ -3138,8 +3245,7 @@ def _serve_virtual_segment(job_id, segment_key):
 
     prefix = _get_segment_prefix(segment_key)
     if prefix and segment_key.endswith(".ts"):
-        with _last_player_segment_lock:
-            _last_player_segment[(job_id, prefix)] = segment_key
+        _record_player_segment(job_id, prefix, segment_key)
     # 1. Return from virtual cache if already transcoded
     virtual_cache_key = f"{job_id}/{segment_key}"
     cached = _segment_cache.get(virtual_cache_key)
@@ -3186,8 +3292,7 @@ def serve_segment(job_id, segment_key):
 
     _prefix = _get_segment_prefix(segment_key)
     if _prefix and _prefix.startswith("video") and segment_key.endswith(".ts"):
-        with _last_player_segment_lock:
-            _last_player_segment[(job_id, _prefix)] = segment_key
+        _record_player_segment(job_id, _prefix, segment_key)
 
     if segment_key.endswith(".vtt"):
         content_type = "text/vtt"
@@ -4,16 +4,38 @@ import re
 from urllib.parse import urlsplit
 
 try:
-    from dotenv import load_dotenv
+    from dotenv import dotenv_values, load_dotenv
 except ImportError:  # pragma: no cover - exercised only in minimal environments
     def load_dotenv():
         return False
 
+    def dotenv_values():
+        return {}
+
 load_dotenv()
 
 _logger = logging.getLogger(__name__)
 
 _BITRATE_RE = re.compile(r"^\d+(\.\d+)?[kKmMgG]$")
+_BOT_TOKEN_RE = re.compile(r"^[0-9]{8,12}:[a-zA-Z0-9_-]{35,45}$")
+_BOT_ENV_KEY_RE = re.compile(r"^TELEGRAM_(BOT_TOKEN|CHANNEL_ID)_(0|[1-9]\d*)$")
+# Telegram file_id validation (no whitespace/newlines)
+_FILE_ID_RE = re.compile(r"^[a-zA-Z0-9_-]{50,255}$")
+# One "height:bitrate" tier entry; both parts are captured without surrounding
+# whitespace and validated by _parse_tiers.
+_TIER_ENTRY_RE = re.compile(r"^\s*([^:]*?)\s*:\s*([^:]*?)\s*$")
+
+# Accepted spellings for boolean flags in env vars and settings payloads;
+# anything else falls back to the flag's default.
+_TRUE_VALUES = frozenset({"true", "1", "yes", "on"})
+_FALSE_VALUES = frozenset({"false", "0", "no", "off"})
+# Flags that change what the server trusts or exposes keep the original
+# "true"-only spelling, so an existing BEHIND_PROXY=1 stays off.
+_STRICT_BOOL_KEYS = frozenset({"FORCE_HTTPS", "BEHIND_PROXY", "CLOUDFLARED_ENABLED"})
+# Settings stored as CSV in the DB but held as tuples at runtime.
+_TUPLE_SETTING_KEYS = frozenset({"WATCH_VIDEO_EXTENSIONS", "WATCH_IGNORE_SUFFIXES"})
+# Settings whose change requires rebuilding the Telegram bot clients (none yet).
+_BOT_RELOAD_SETTING_KEYS = frozenset()
 
 
 def _parse_tiers(raw, as_dict=False):
@@ -31,10 +53,10 @@ def _parse_tiers(raw, as_dict=False):
         entry = entry.strip()
         if not entry:
             continue
-        parts = entry.split(":")
-        if len(parts) != 2:
+        match = _TIER_ENTRY_RE.match(entry)
+        if match is None:
             raise ValueError(f"Invalid tier entry {entry!r}: expected height:bitrate")
-        height_str, bitrate = parts[0].strip(), parts[1].strip()
+        height_str, bitrate = match.groups()
         try:
             height = int(height_str)
         except ValueError:
@@ -62,17 +84,43 @@ def _int_env(name, default):
         return default
 
 
+def _split_csv(raw):
+    """Split a comma-separated string into stripped, non-empty items."""
+    return [item for item in map(str.strip, raw.split(",")) if item]
+
+
+def is_valid_file_id(file_id):
+    """Return whether file_id looks like a Telegram file_id (no whitespace/newlines)."""
+    return bool(file_id) and _FILE_ID_RE.fullmatch(str(file_id)) is not None
+
+
+def _parse_bool(raw, default=False, strict=False):
+    """Interpret a string flag, returning default for unrecognized values.
+
+    strict=True accepts only "true" as a true value.
+    """
+    value = str(raw).strip().lower()
+    if value == "true" or (not strict and value in _TRUE_VALUES):
+        return True
+    if value in _FALSE_VALUES:
+        return False
+    return default
+
+
+def _bool_env(name, default, strict=False):
+    """Read a boolean flag from an environment variable."""
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return _parse_bool(raw, default, strict=strict)
+
+
 def _csv_env(name, default):
     """Read a comma-separated env var into a normalized list of strings."""
     raw = os.getenv(name)
     if raw is None:
         raw = default
-    values = []
-    for entry in raw.split(","):
-        item = entry.strip()
-        if item:
-            values.append(item)
-    return values
+    return _split_csv(raw)
 
 
 def _parse_cors_allowed_origins(raw):
@@ -95,66 +143,122 @@ def _parse_cors_allowed_origins(raw):
     return values, tuples
 
 
-class Config:
-    # Server
-    HOST = os.getenv("LOCAL_HOST", "0.0.0.0")
-    PORT = _int_env("LOCAL_PORT", 5050)
-    FORCE_HTTPS = os.getenv("FORCE_HTTPS", "false").lower() == "true"
-    BEHIND_PROXY = os.getenv("BEHIND_PROXY", "false").lower() == "true"
-    TRUSTED_PROXY_CIDRS = _csv_env("TRUSTED_PROXY_CIDRS", "127.0.0.1/32,::1/128")
-
-    # Cloudflare tunnel
-    CLOUDFLARED_ENABLED = os.getenv("CLOUDFLARED_ENABLED", "false").lower() == "true"
-
-    # File handling
-    TELEGRAM_MAX_FILE_SIZE = _int_env("TELEGRAM_MAX_FILE_SIZE", 20971520)
-    MAX_UPLOAD_SIZE = _int_env("MAX_UPLOAD_SIZE", 107374182400)  # 100GB
-    UPLOAD_CHUNK_SIZE = _int_env("UPLOAD_CHUNK_SIZE", 10485760)  # 10MB per chunk
-    SEGMENT_TARGET_SIZE = _int_env("SEGMENT_TARGET_SIZE", 15728640)  # 15MB preferred FFmpeg segment target
-    SEGMENT_CACHE_SIZE_MB = _int_env("SEGMENT_CACHE_SIZE_MB", 200)
-    SEGMENT_PREFETCH_COUNT = _int_env("SEGMENT_PREFETCH_COUNT", 3)
-    SEGMENT_PREFETCH_MIN_FREE_BYTES = _int_env("SEGMENT_PREFETCH_MIN_FREE_BYTES", 0)
-
-    # Hardware acceleration
-    ENABLE_HW_ACCEL = os.getenv("ENABLE_HARDWARE_ACCELERATION", "true").lower() == "true"
-    PREFERRED_ENCODER = os.getenv("PREFERRED_ENCODER", "vaapi")
-    # Max simultaneous FFmpeg video encodes. Default 2 is safe for GPU encoders
-    # (NVENC consumer cards cap at ~5 sessions; VAAPI varies by driver).
-    # Increase for CPU encoding on multi-core systems.
-    MAX_PARALLEL_ENCODES = _int_env("MAX_PARALLEL_ENCODES", 2)
-    # VAAPI device path. Leave empty to auto-detect (picks highest renderD* device,
-    # which is typically the discrete GPU on multi-GPU systems).
-    VAAPI_DEVICE = os.getenv("VAAPI_DEVICE", "").strip()
-    VIDEO_BITRATE = os.getenv("VIDEO_BITRATE", "4M")
-    AUDIO_BITRATE = os.getenv("AUDIO_BITRATE", "128k")
-
-    # HLS
-    HLS_SEGMENT_DURATION = _int_env("HLS_SEGMENT_DURATION", 4)
-
-    # Adaptive Bitrate Streaming
-    ABR_ENABLED = os.getenv("ABR_ENABLED", "true").lower() == "true"
-    ENABLE_COPY_MODE = os.getenv("ENABLE_COPY_MODE", "true").lower() == "true"
-    VIRTUAL_ABR_TIERS = os.getenv("VIRTUAL_ABR_TIERS", "false").lower() in ("true", "1", "yes")
-    ABR_TIERS = _parse_tiers(os.getenv("ABR_TIERS")) or [
-        {"height": 1080, "bitrate": "10M"},
-        {"height": 720, "bitrate": "5M"},
-        {"height": 480, "bitrate": "2M"},
-        {"height": 360, "bitrate": "1200k"},
-    ]
+def _apply_dotenv_overrides():
+    """Re-read .env and push its values into os.environ, overriding existing ones.
 
-    # Tier 0 CBR bitrates by source resolution (near-lossless quality)
-    TIER0_BITRATES = _parse_tiers(os.getenv("TIER0_BITRATES"), as_dict=True) or {
-        2160: "60M",   # 4K
-        1080: "30M",   # 1080p
-        720: "15M",    # 720p
-        480: "5M",     # 480p
+    Same outcome as load_dotenv(override=True), but the file is parsed into a
+    dict first and only keys whose value differs are written back, so reloading
+    an unchanged .env does not re-set every variable.
+    """
+    changed = {
+        key: value
+        for key, value in dotenv_values().items()
+        if value is not None and os.environ.get(key) != value
     }
-    TIER0_BITRATE_DEFAULT = os.getenv("TIER0_BITRATE_DEFAULT", "15M").strip()
+    if changed:
+        os.environ.update(changed)
+    return changed
+
+
+def _read_env_settings():
+    """Read every env-backed runtime setting into an attr -> value map.
+
+    Used for the initial Config values and by Config.reload(), so both paths
+    parse the environment the same way. WATCH_ENABLED/WATCH_ROOT/WATCH_DONE_DIR
+    are not included; they are managed through the watch-settings API.
+    """
+    cors_origins, cors_tuples = _parse_cors_allowed_origins(os.getenv("CORS_ALLOWED_ORIGINS", ""))
+    return {
+        # Server
+        "HOST": os.getenv("LOCAL_HOST", "0.0.0.0"),
+        "PORT": _int_env("LOCAL_PORT", 5050),
+        "FORCE_HTTPS": _bool_env("FORCE_HTTPS", False, strict=True),
+        "BEHIND_PROXY": _bool_env("BEHIND_PROXY", False, strict=True),
+        "TRUSTED_PROXY_CIDRS": _csv_env("TRUSTED_PROXY_CIDRS", "127.0.0.1/32,::1/128"),
+        # Cloudflare tunnel
+        "CLOUDFLARED_ENABLED": _bool_env("CLOUDFLARED_ENABLED", False, strict=True),
+        # File handling
+        "TELEGRAM_MAX_FILE_SIZE": _int_env("TELEGRAM_MAX_FILE_SIZE", 20971520),
+        "MAX_UPLOAD_SIZE": _int_env("MAX_UPLOAD_SIZE", 107374182400),  # 100GB
+        "UPLOAD_CHUNK_SIZE": _int_env("UPLOAD_CHUNK_SIZE", 10485760),  # 10MB per chunk
+        "SEGMENT_TARGET_SIZE": _int_env("SEGMENT_TARGET_SIZE", 15728640),  # 15MB preferred FFmpeg segment target
+        "SEGMENT_CACHE_SIZE_MB": _int_env("SEGMENT_CACHE_SIZE_MB", 200),
+        "SEGMENT_PREFETCH_COUNT": _int_env("SEGMENT_PREFETCH_COUNT", 3),
+        "SEGMENT_PREFETCH_MIN_FREE_BYTES": _int_env("SEGMENT_PREFETCH_MIN_FREE_BYTES", 0),
+        # Hardware acceleration
+        "ENABLE_HW_ACCEL": _bool_env("ENABLE_HARDWARE_ACCELERATION", True),
+        "PREFERRED_ENCODER": os.getenv("PREFERRED_ENCODER", "vaapi"),
+        # Max simultaneous FFmpeg video encodes. Default 2 is safe for GPU encoders
+        # (NVENC consumer cards cap at ~5 sessions; VAAPI varies by driver).
+        # Increase for CPU encoding on multi-core systems.
+        "MAX_PARALLEL_ENCODES": _int_env("MAX_PARALLEL_ENCODES", 2),
+        # VAAPI device path. Leave empty to auto-detect (picks highest renderD* device,
+        # which is typically the discrete GPU on multi-GPU systems).
+        "VAAPI_DEVICE": os.getenv("VAAPI_DEVICE", "").strip(),
+        "VIDEO_BITRATE": os.getenv("VIDEO_BITRATE", "4M"),
+        "AUDIO_BITRATE": os.getenv("AUDIO_BITRATE", "128k"),
+        # HLS
+        "HLS_SEGMENT_DURATION": _int_env("HLS_SEGMENT_DURATION", 4),
+        # Adaptive Bitrate Streaming
+        "ABR_ENABLED": _bool_env("ABR_ENABLED", True),
+        "ENABLE_COPY_MODE": _bool_env("ENABLE_COPY_MODE", True),
+        "VIRTUAL_ABR_TIERS": _bool_env("VIRTUAL_ABR_TIERS", False),
+        "ABR_TIERS": _parse_tiers(os.getenv("ABR_TIERS")) or [
+            {"height": 1080, "bitrate": "10M"},
+            {"height": 720, "bitrate": "5M"},
+            {"height": 480, "bitrate": "2M"},
+            {"height": 360, "bitrate": "1200k"},
+        ],
+        # Tier 0 CBR bitrates by source resolution (near-lossless quality)
+        "TIER0_BITRATES": _parse_tiers(os.getenv("TIER0_BITRATES"), as_dict=True) or {
+            2160: "60M",   # 4K
+            1080: "30M",   # 1080p
+            720: "15M",    # 720p
+            480: "5M",     # 480p
+        },
+        "TIER0_BITRATE_DEFAULT": os.getenv("TIER0_BITRATE_DEFAULT", "15M").strip(),
+        # Watch folder scanning
+        "WATCH_POLL_SECONDS": max(1, _int_env("WATCH_POLL_SECONDS", 5)),
+        "WATCH_STABLE_SECONDS": max(1, _int_env("WATCH_STABLE_SECONDS", 30)),
+        "WATCH_VIDEO_EXTENSIONS": tuple(
+            ext.lower() if ext.startswith(".") else f".{ext.lower()}"
+            for ext in _csv_env("WATCH_VIDEO_EXTENSIONS", "mp4,mkv,avi,mov,webm,ts,m4v,flv")
+        ),
+        "WATCH_IGNORE_SUFFIXES": tuple(
+            suffix.lower() for suffix in _csv_env("WATCH_IGNORE_SUFFIXES", ".part,.crdownload,.tmp,.partial")
+        ),
+        # Reliability / cleanup
+        "JOB_TIMEOUT_SECONDS": _int_env("JOB_TIMEOUT_SECONDS", 7200),  # 2h
+        "PENDING_UPLOAD_TTL_SECONDS": _int_env("PENDING_UPLOAD_TTL_SECONDS", 86400),  # 24h
+        "PENDING_UPLOAD_CLEANUP_INTERVAL_SECONDS": _int_env("PENDING_UPLOAD_CLEANUP_INTERVAL_SECONDS", 300),
+        # Retention: automatically delete completed jobs older than N days (0 = disabled)
+        "JOB_RETENTION_DAYS": _int_env("JOB_RETENTION_DAYS", 0),
+        # Queue: max number of jobs encoding concurrently; twice as many workers
+        # run so the next jobs can encode while earlier ones finish uploading
+        "MAX_CONCURRENT_JOBS": _int_env("MAX_CONCURRENT_JOBS", 1),
+        "CORS_ALLOWED_ORIGINS": cors_origins,
+        "CORS_ALLOWED_ORIGIN_TUPLES": cors_tuples,
+        # Rate limiting for upload endpoints (per IP)
+        "UPLOAD_RATE_LIMIT_WINDOW": _int_env("UPLOAD_RATE_LIMIT_WINDOW", 60),  # seconds
+        "UPLOAD_RATE_LIMIT_MAX_REQUESTS": _int_env("UPLOAD_RATE_LIMIT_MAX_REQUESTS", 100),
+        # Max concurrent pending uploads per IP (0 = unlimited)
+        "MAX_PENDING_UPLOADS_PER_IP": _int_env("MAX_PENDING_UPLOADS_PER_IP", 5),
+        # Telegram
+        "UPLOAD_PARALLELISM": _int_env("UPLOAD_PARALLELISM", 8),
+        "DB_AUTO_MERGE_INTERVAL_MINUTES": _int_env("DB_AUTO_MERGE_INTERVAL_MINUTES", 0),
+        "DB_AUTO_MERGE_FILE_ID": os.getenv("DB_AUTO_MERGE_FILE_ID", "").strip(),
+        "DB_AUTO_MERGE_BOT_INDEX": _int_env("DB_AUTO_MERGE_BOT_INDEX", 0),
+    }
+
+
+class Config:
+    # Env-backed runtime settings (HOST, PORT, ABR_TIERS, ...) are assigned from
+    # _read_env_settings() right after the class body and again by reload().
 
     # Directories
     UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "uploads")
     PROCESSING_DIR = os.path.join(os.path.dirname(__file__), "processing")
-    WATCH_ENABLED = os.getenv("WATCH_ENABLED", "false").lower() == "true"
+    WATCH_ENABLED = _bool_env("WATCH_ENABLED", False)
     WATCH_ROOT = os.path.abspath(os.path.expanduser(os.getenv("WATCH_ROOT", "").strip()))
     _watch_done_dir = os.getenv("WATCH_DONE_DIR", "").strip()
     WATCH_DONE_DIR = (
@@ -162,43 +266,9 @@ class Config:
         if _watch_done_dir
         else (os.path.join(WATCH_ROOT, "done") if WATCH_ROOT else "")
     )
-    WATCH_POLL_SECONDS = max(1, _int_env("WATCH_POLL_SECONDS", 5))
-    WATCH_STABLE_SECONDS = max(1, _int_env("WATCH_STABLE_SECONDS", 30))
-    WATCH_VIDEO_EXTENSIONS = tuple(
-        ext.lower() if ext.startswith(".") else f".{ext.lower()}"
-        for ext in _csv_env("WATCH_VIDEO_EXTENSIONS", "mp4,mkv,avi,mov,webm,ts,m4v,flv")
-    )
-    WATCH_IGNORE_SUFFIXES = tuple(
-        suffix.lower() for suffix in _csv_env("WATCH_IGNORE_SUFFIXES", ".part,.crdownload,.tmp,.partial")
-    )
-
-    # Reliability / cleanup
-    JOB_TIMEOUT_SECONDS = _int_env("JOB_TIMEOUT_SECONDS", 7200)  # 2h
-    PENDING_UPLOAD_TTL_SECONDS = _int_env("PENDING_UPLOAD_TTL_SECONDS", 86400)  # 24h
-    PENDING_UPLOAD_CLEANUP_INTERVAL_SECONDS = _int_env(
-        "PENDING_UPLOAD_CLEANUP_INTERVAL_SECONDS", 300
-    )
-    # Retention: automatically delete completed jobs older than N days (0 = disabled)
-    JOB_RETENTION_DAYS = _int_env("JOB_RETENTION_DAYS", 0)
-
-    # Queue: max number of jobs processed concurrently
-    MAX_CONCURRENT_JOBS = _int_env("MAX_CONCURRENT_JOBS", 1)
-    CORS_ALLOWED_ORIGINS, CORS_ALLOWED_ORIGIN_TUPLES = _parse_cors_allowed_origins(
-        os.getenv("CORS_ALLOWED_ORIGINS", "")
-    )
-
-    # Rate limiting for upload endpoints (per IP)
-    UPLOAD_RATE_LIMIT_WINDOW = _int_env("UPLOAD_RATE_LIMIT_WINDOW", 60)  # seconds
-    UPLOAD_RATE_LIMIT_MAX_REQUESTS = _int_env("UPLOAD_RATE_LIMIT_MAX_REQUESTS", 100)
-    # Max concurrent pending uploads per IP (0 = unlimited)
-    MAX_PENDING_UPLOADS_PER_IP = _int_env("MAX_PENDING_UPLOADS_PER_IP", 5)
 
     # Telegram bots
     BOTS = []
-    UPLOAD_PARALLELISM = _int_env("UPLOAD_PARALLELISM", 8)
-    DB_AUTO_MERGE_INTERVAL_MINUTES = _int_env("DB_AUTO_MERGE_INTERVAL_MINUTES", 0)
-    DB_AUTO_MERGE_FILE_ID = os.getenv("DB_AUTO_MERGE_FILE_ID", "").strip()
-    DB_AUTO_MERGE_BOT_INDEX = _int_env("DB_AUTO_MERGE_BOT_INDEX", 0)
 
     # Registry of all UI-configurable settings.
     # Each entry: (attr_name, env_name, type_hint, category, description, default_value)
@@ -241,7 +311,7 @@ class Config:
         ("PENDING_UPLOAD_TTL_SECONDS", "PENDING_UPLOAD_TTL_SECONDS", "int", "reliability", "Time before an incomplete chunked upload session expires (seconds)", 86400),
         ("PENDING_UPLOAD_CLEANUP_INTERVAL_SECONDS", "PENDING_UPLOAD_CLEANUP_INTERVAL_SECONDS", "int", "reliability", "How often to sweep and expire stale upload sessions (seconds)", 300),
         ("JOB_RETENTION_DAYS", "JOB_RETENTION_DAYS", "int", "reliability", "Auto-delete completed jobs older than N days (0 = disabled)", 0),
-        ("MAX_CONCURRENT_JOBS", "MAX_CONCURRENT_JOBS", "int", "reliability", "Maximum jobs processed simultaneously", 1),
+        ("MAX_CONCURRENT_JOBS", "MAX_CONCURRENT_JOBS", "int", "reliability", "Maximum jobs encoding simultaneously", 1),
         # Rate limiting
         ("UPLOAD_RATE_LIMIT_WINDOW", "UPLOAD_RATE_LIMIT_WINDOW", "int", "rate_limiting", "Rate-limit window duration per IP (seconds)", 60),
         ("UPLOAD_RATE_LIMIT_MAX_REQUESTS", "UPLOAD_RATE_LIMIT_MAX_REQUESTS", "int", "rate_limiting", "Max upload requests per IP within the window", 100),
@@ -272,10 +342,19 @@ class Config:
     }
 
 
+    # Lazily built by setting_type_map(); CONFIGURABLE_SETTINGS never changes at runtime.
+    _setting_types = None
+
     @classmethod
     def setting_type_map(cls):
-        """Return a map of configurable key -> type hint."""
-        return {entry[0]: entry[2] for entry in cls.CONFIGURABLE_SETTINGS}
+        """Return a map of configurable key -> type hint.
+
+        The map is built on first use and shared afterwards, so callers must
+        treat it as read-only.
+        """
+        if cls._setting_types is None:
+            cls._setting_types = {entry[0]: entry[2] for entry in cls.CONFIGURABLE_SETTINGS}
+        return cls._setting_types
 
     @classmethod
     def parse_setting_value(cls, key, raw_value):
@@ -288,16 +367,16 @@ class Config:
         if type_hint == "bool":
             if isinstance(raw_value, bool):
                 return raw_value
-            return str(raw_value).lower() == "true"
+            return _parse_bool(raw_value, strict=key in _STRICT_BOOL_KEYS)
         if type_hint == "tiers":
             parsed = _parse_tiers(str(raw_value), as_dict=(key == "TIER0_BITRATES"))
             if parsed is None:
                 raise ValueError("tiers value cannot be empty")
             return parsed
-        if key in ("WATCH_VIDEO_EXTENSIONS", "WATCH_IGNORE_SUFFIXES"):
-            return tuple(s.strip() for s in str(raw_value).split(",") if s.strip())
+        if key in _TUPLE_SETTING_KEYS:
+            return tuple(_split_csv(str(raw_value)))
         if key == "TRUSTED_PROXY_CIDRS":
-            return [s.strip() for s in str(raw_value).split(",") if s.strip()]
+            return _split_csv(str(raw_value))
         if key == "CORS_ALLOWED_ORIGINS":
             parsed, _ = _parse_cors_allowed_origins(str(raw_value))
             return parsed
@@ -317,7 +396,7 @@ class Config:
             if isinstance(parsed_value, list):
                 return ",".join(f"{t['height']}:{t['bitrate']}" for t in parsed_value)
             return str(parsed_value)
-        if key in ("WATCH_VIDEO_EXTENSIONS", "WATCH_IGNORE_SUFFIXES") and isinstance(parsed_value, tuple):
+        if key in _TUPLE_SETTING_KEYS and isinstance(parsed_value, tuple):
             return ",".join(parsed_value)
         if key == "TRUSTED_PROXY_CIDRS" and isinstance(parsed_value, list):
             return ",".join(parsed_value)
@@ -334,23 +413,25 @@ class Config:
     @classmethod
     def settings_require_bot_reload(cls, changed_keys):
         """Return whether changed setting keys require Telegram bot client rebuild."""
-        bot_reload_keys = set()
-        return bool(set(changed_keys) & bot_reload_keys)
+        return not _BOT_RELOAD_SETTING_KEYS.isdisjoint(changed_keys)
 
     @classmethod
     def load_bots(cls):
         cls.BOTS = []
-        token_pattern = re.compile(r"^[0-9]{8,12}:[a-zA-Z0-9_-]{35,45}$")
-        suffix_re = re.compile(r"^TELEGRAM_BOT_TOKEN_(\d+)$")
-        suffixes = sorted(
-            (int(m.group(1)) for key in os.environ if (m := suffix_re.match(key))),
-        )
+        # One pass over the environment, bucketing tokens and channels by suffix.
+        tokens = {}
+        channels = {}
+        for key, value in os.environ.items():
+            m = _BOT_ENV_KEY_RE.match(key)
+            if m is not None:
+                bucket = tokens if m.group(1) == "BOT_TOKEN" else channels
+                bucket[int(m.group(2))] = value
         seen_tokens = set()
-        for i in suffixes:
-            token = os.getenv(f"TELEGRAM_BOT_TOKEN_{i}")
-            channel = os.getenv(f"TELEGRAM_CHANNEL_ID_{i}")
+        for i in sorted(tokens):
+            token = tokens[i]
+            channel = channels.get(i)
             if token and channel and not token.startswith("your_"):
-                if not token_pattern.match(token):
+                if not _BOT_TOKEN_RE.match(token):
                     raise ValueError(f"Invalid TELEGRAM_BOT_TOKEN_{i}: malformed token format")
                 try:
                     channel_id = int(channel)
@@ -387,7 +468,7 @@ class Config:
 
         db_settings = _db.get_all_settings()
 
-        _type_map = {entry[0]: entry[2] for entry in cls.CONFIGURABLE_SETTINGS}
+        _type_map = cls.setting_type_map()
 
         for key, raw_value in db_settings.items():
             type_hint = _type_map.get(key)
@@ -397,16 +478,16 @@ class Config:
                 if type_hint == "int":
                     setattr(cls, key, int(raw_value))
                 elif type_hint == "bool":
-                    setattr(cls, key, raw_value.lower() == "true")
+                    setattr(cls, key, _parse_bool(raw_value, strict=key in _STRICT_BOOL_KEYS))
                 elif type_hint == "tiers":
                     parsed = _parse_tiers(raw_value, as_dict=(key == "TIER0_BITRATES"))
                     if parsed is not None:
                         setattr(cls, key, parsed)
-                elif key in ("WATCH_VIDEO_EXTENSIONS", "WATCH_IGNORE_SUFFIXES"):
+                elif key in _TUPLE_SETTING_KEYS:
                     # Stored as CSV string; runtime attr is a tuple
-                    setattr(cls, key, tuple(s.strip() for s in raw_value.split(",") if s.strip()))
+                    setattr(cls, key, tuple(_split_csv(raw_value)))
                 elif key == "TRUSTED_PROXY_CIDRS":
-                    setattr(cls, key, [s.strip() for s in raw_value.split(",") if s.strip()])
+                    setattr(cls, key, _split_csv(raw_value))
                 elif key == "CORS_ALLOWED_ORIGINS":
                     # Stored as CSV string; runtime attr is a list
                     parsed_origins, parsed_tuples = _parse_cors_allowed_origins(raw_value)
@@ -440,68 +521,8 @@ class Config:
 
         This is the single entry point for "refresh everything at runtime".
         """
-        load_dotenv(override=True)
-        # Re-read all env vars into class attributes
-        cls.HOST = os.getenv("LOCAL_HOST", "0.0.0.0")
-        cls.PORT = _int_env("LOCAL_PORT", 5050)
-        cls.FORCE_HTTPS = os.getenv("FORCE_HTTPS", "false").lower() == "true"
-        cls.BEHIND_PROXY = os.getenv("BEHIND_PROXY", "false").lower() == "true"
-        cls.TRUSTED_PROXY_CIDRS = _csv_env("TRUSTED_PROXY_CIDRS", "127.0.0.1/32,::1/128")
-        cls.CLOUDFLARED_ENABLED = os.getenv("CLOUDFLARED_ENABLED", "false").lower() == "true"
-        cls.TELEGRAM_MAX_FILE_SIZE = _int_env("TELEGRAM_MAX_FILE_SIZE", 20971520)
-        cls.MAX_UPLOAD_SIZE = _int_env("MAX_UPLOAD_SIZE", 107374182400)
-        cls.UPLOAD_CHUNK_SIZE = _int_env("UPLOAD_CHUNK_SIZE", 10485760)
-        cls.SEGMENT_TARGET_SIZE = _int_env("SEGMENT_TARGET_SIZE", 15728640)
-        cls.SEGMENT_CACHE_SIZE_MB = _int_env("SEGMENT_CACHE_SIZE_MB", 200)
-        cls.SEGMENT_PREFETCH_COUNT = _int_env("SEGMENT_PREFETCH_COUNT", 3)
-        cls.SEGMENT_PREFETCH_MIN_FREE_BYTES = _int_env("SEGMENT_PREFETCH_MIN_FREE_BYTES", 0)
-        cls.ENABLE_HW_ACCEL = os.getenv("ENABLE_HARDWARE_ACCELERATION", "true").lower() == "true"
-        cls.PREFERRED_ENCODER = os.getenv("PREFERRED_ENCODER", "vaapi")
-        cls.MAX_PARALLEL_ENCODES = _int_env("MAX_PARALLEL_ENCODES", 2)
-        cls.VAAPI_DEVICE = os.getenv("VAAPI_DEVICE", "").strip()
-        cls.VIDEO_BITRATE = os.getenv("VIDEO_BITRATE", "4M")
-        cls.AUDIO_BITRATE = os.getenv("AUDIO_BITRATE", "128k")
-        cls.HLS_SEGMENT_DURATION = _int_env("HLS_SEGMENT_DURATION", 4)
-        cls.ABR_ENABLED = os.getenv("ABR_ENABLED", "true").lower() == "true"
-        cls.ENABLE_COPY_MODE = os.getenv("ENABLE_COPY_MODE", "true").lower() == "true"
-        cls.VIRTUAL_ABR_TIERS = os.getenv("VIRTUAL_ABR_TIERS", "false").lower() in ("true", "1", "yes")
-        cls.ABR_TIERS = _parse_tiers(os.getenv("ABR_TIERS")) or [
-            {"height": 1080, "bitrate": "10M"},
-            {"height": 720, "bitrate": "5M"},
-            {"height": 480, "bitrate": "2M"},
-            {"height": 360, "bitrate": "1200k"},
-        ]
-        cls.TIER0_BITRATES = _parse_tiers(os.getenv("TIER0_BITRATES"), as_dict=True) or {
-            2160: "60M",
-            1080: "30M",
-            720: "15M",
-            480: "5M",
-        }
-        cls.TIER0_BITRATE_DEFAULT = os.getenv("TIER0_BITRATE_DEFAULT", "15M").strip()
-        cls.JOB_TIMEOUT_SECONDS = _int_env("JOB_TIMEOUT_SECONDS", 7200)
-        cls.PENDING_UPLOAD_TTL_SECONDS = _int_env("PENDING_UPLOAD_TTL_SECONDS", 86400)
-        cls.PENDING_UPLOAD_CLEANUP_INTERVAL_SECONDS = _int_env("PENDING_UPLOAD_CLEANUP_INTERVAL_SECONDS", 300)
-        cls.JOB_RETENTION_DAYS = _int_env("JOB_RETENTION_DAYS", 0)
-        cls.MAX_CONCURRENT_JOBS = _int_env("MAX_CONCURRENT_JOBS", 1)
-        cls.CORS_ALLOWED_ORIGINS, cls.CORS_ALLOWED_ORIGIN_TUPLES = _parse_cors_allowed_origins(
-            os.getenv("CORS_ALLOWED_ORIGINS", "")
-        )
-        cls.UPLOAD_RATE_LIMIT_WINDOW = _int_env("UPLOAD_RATE_LIMIT_WINDOW", 60)
-        cls.UPLOAD_RATE_LIMIT_MAX_REQUESTS = _int_env("UPLOAD_RATE_LIMIT_MAX_REQUESTS", 100)
-        cls.MAX_PENDING_UPLOADS_PER_IP = _int_env("MAX_PENDING_UPLOADS_PER_IP", 5)
-        cls.WATCH_POLL_SECONDS = max(1, _int_env("WATCH_POLL_SECONDS", 5))
-        cls.WATCH_STABLE_SECONDS = max(1, _int_env("WATCH_STABLE_SECONDS", 30))
-        cls.WATCH_VIDEO_EXTENSIONS = tuple(
-            ext.lower() if ext.startswith(".") else f".{ext.lower()}"
-            for ext in _csv_env("WATCH_VIDEO_EXTENSIONS", "mp4,mkv,avi,mov,webm,ts,m4v,flv")
-        )
-        cls.WATCH_IGNORE_SUFFIXES = tuple(
-            suffix.lower() for suffix in _csv_env("WATCH_IGNORE_SUFFIXES", ".part,.crdownload,.tmp,.partial")
-        )
-        cls.UPLOAD_PARALLELISM = _int_env("UPLOAD_PARALLELISM", 8)
-        cls.DB_AUTO_MERGE_INTERVAL_MINUTES = _int_env("DB_AUTO_MERGE_INTERVAL_MINUTES", 0)
-        cls.DB_AUTO_MERGE_FILE_ID = os.getenv("DB_AUTO_MERGE_FILE_ID", "").strip()
-        cls.DB_AUTO_MERGE_BOT_INDEX = _int_env("DB_AUTO_MERGE_BOT_INDEX", 0)
+        _apply_dotenv_overrides()
+        cls.apply_runtime_settings(_read_env_settings())
         cls.load_bots()
         cls.load_from_db()
 
@@ -542,6 +563,7 @@ class Config:
         return {"categories": categories}
 
 
+Config.apply_runtime_settings(_read_env_settings())
 Config.load_bots()
 Config.load_from_db()
 os.makedirs(Config.UPLOAD_DIR, exist_ok=True)
@@ -16,16 +16,35 @@ import logging
 import os
 import sqlite3
 import threading
-import time
 from typing import Set
 
 logger = logging.getLogger(__name__)
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "streamer.db")
-LATEST_SCHEMA_REVISION = 9
+LATEST_SCHEMA_REVISION = 10
 VALID_MEDIA_TYPES = ("Film", "Series", "Anime Film", "Anime TV", "Anime")
 
-# Thread-local connections for SQLite (which doesn't allow sharing across threads)
+# Applied to every new connection. WAL lets readers proceed alongside the single
+# writer, and synchronous=NORMAL is durable enough under WAL (a crash can lose the
+# last commits but never corrupts the file) while skipping an fsync per commit.
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",  # 64 MiB page cache per connection
+    "PRAGMA analysis_limit=1000",  # bound ANALYZE / PRAGMA optimize on large tables
+)
+_MMAP_SIZE_BYTES = 256 * 1024 * 1024
+# Per-connection prepared-statement cache. The module's queries plus the
+# filter/grouping variants built by list_jobs()/count_jobs() exceed the default.
+_STATEMENT_CACHE_SIZE = 256
+# save_job() refreshes segments statistics after ingesting at least this many rows.
+_ANALYZE_SEGMENT_THRESHOLD = 500
+
+# Thread-local connections for SQLite (which doesn't allow sharing across threads).
+# Each request/worker thread has its own connection, so under WAL reads on one
+# thread never wait for a write transaction held by another.
 _local = threading.local()
 # Track all opened connections so they can be closed on shutdown
 _all_connections = []
@@ -35,11 +54,13 @@ _all_connections_lock = threading.Lock()
 def _get_conn() -> sqlite3.Connection:
     for attempt in range(2):
         if not hasattr(_local, "conn") or _local.conn is None:
-            conn = sqlite3.connect(DB_PATH)
+            conn = sqlite3.connect(DB_PATH, cached_statements=_STATEMENT_CACHE_SIZE)
             try:
                 conn.row_factory = sqlite3.Row
-                conn.execute("PRAGMA journal_mode=WAL")
-                conn.execute("PRAGMA foreign_keys=ON")
+                for pragma in _CONNECTION_PRAGMAS:
+                    conn.execute(pragma)
+                if DB_PATH != ":memory:":
+                    conn.execute(f"PRAGMA mmap_size={_MMAP_SIZE_BYTES}")
             except Exception:
                 try:
                     conn.close()
@@ -78,6 +99,21 @@ def _reset_conn():
                 pass
 
 
+def _optimize_and_close(conn: sqlite3.Connection):
+    """Let SQLite refresh stale planner statistics, then close the connection.
+
+    Only used by the shutdown sweep; per-request closes stay cheap.
+    """
+    try:
+        conn.execute("PRAGMA optimize")
+    except Exception:
+        pass
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
 def close_conn():
     """Explicitly close the current thread's database connection.
 
@@ -108,10 +144,7 @@ def _close_all_connections():
     """Close all tracked database connections (called at interpreter shutdown)."""
     with _all_connections_lock:
         for conn in _all_connections:
-            try:
-                conn.close()
-            except Exception:
-                pass
+            _optimize_and_close(conn)
         _all_connections.clear()
 
 
@@ -516,6 +549,17 @@ def _migration_009_add_bot_index_segment_index(conn: sqlite3.Connection):
     """)
 
 
+def _migration_010_add_segment_covering_indexes(conn: sqlite3.Connection):
+    # (bot_index, file_size) answers get_bot_workload_stats() from the index
+    # alone and supersedes idx_segments_bot_index. idx_segments_job duplicates
+    # the leading column of the UNIQUE(job_id, segment_key) index.
+    conn.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_segments_bot_size ON segments(bot_index, file_size);
+        DROP INDEX IF EXISTS idx_segments_bot_index;
+        DROP INDEX IF EXISTS idx_segments_job;
+    """)
+
+
 MIGRATIONS = [
     (1, "create_base_schema", _migration_001_create_base_schema),
     (2, "add_track_dimensions_and_stream_index", _migration_002_add_track_dimensions_and_stream_index),
@@ -526,6 +570,7 @@ MIGRATIONS = [
     (7, "add_listing_performance_indexes", _migration_007_add_listing_performance_indexes),
     (8, "enforce_data_constraints", _migration_008_enforce_data_constraints),
     (9, "add_bot_index_segment_index", _migration_009_add_bot_index_segment_index),
+    (10, "add_segment_covering_indexes", _migration_010_add_segment_covering_indexes),
 ]
 
 
@@ -657,6 +702,28 @@ def export_to_dict() -> dict:
     }
 
 
+_EXPORT_TABLES = ("jobs", "tracks", "segments")
+
+
+def export_tables_json() -> dict:
+    """Export the same rows as export_to_dict(), serialised by SQLite.
+
+    Returns {table: (json_array_text, row_count)}. Rows are encoded with
+    json_group_array/json_object, so a large segments table is never
+    materialised as per-row Python dicts just to be dumped back to JSON.
+    """
+    conn = _get_conn()
+    result = {}
+    for table in _EXPORT_TABLES:
+        columns = [row["name"] for row in conn.execute(f"PRAGMA table_info({table})")]
+        fields = ", ".join(f"'{name}', \"{name}\"" for name in columns)
+        row = conn.execute(
+            f"SELECT COUNT(*), json_group_array(json_object({fields})) FROM {table}"
+        ).fetchone()
+        result[table] = (row[1], row[0])
+    return result
+
+
 def merge_from_export(
     jobs: list[dict],
     tracks: list[dict],
@@ -665,18 +732,28 @@ def merge_from_export(
 ) -> dict:
     """Merge an exported payload into this DB in one transaction."""
     conn = _get_conn()
-    merged_jobs = 0
-    skipped_jobs = 0
-    merged_segments = 0
+    segment_rows = []
+    for segment in segments:
+        source_bot_index = int(segment.get("bot_index", -1))
+        if source_bot_index not in bot_index_map:
+            raise ValueError(f"No bot index mapping for source bot index {source_bot_index}")
+        segment_rows.append((
+            segment.get("job_id"),
+            segment.get("segment_key"),
+            segment.get("file_id"),
+            bot_index_map[source_bot_index],
+            segment.get("file_size", 0),
+            segment.get("duration"),
+        ))
 
     with conn:
-        for job in jobs:
-            cursor = conn.execute(
-                """INSERT OR IGNORE INTO jobs
-                   (job_id, filename, duration, file_size, video_codec, video_width, video_height,
-                    status, created_at, media_type, series_name, has_thumbnail, is_series,
-                    season_number, episode_number, part_number)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        cursor = conn.executemany(
+            """INSERT OR IGNORE INTO jobs
+               (job_id, filename, duration, file_size, video_codec, video_width, video_height,
+                status, created_at, media_type, series_name, has_thumbnail, is_series,
+                season_number, episode_number, part_number)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [
                 (
                     job.get("job_id"),
                     job.get("filename"),
@@ -694,19 +771,20 @@ def merge_from_export(
                     job.get("season_number"),
                     job.get("episode_number"),
                     job.get("part_number"),
-                ),
-            )
-            if cursor.rowcount == 1:
-                merged_jobs += 1
-            else:
-                skipped_jobs += 1
+                )
+                for job in jobs
+            ],
+        )
+        # executemany() reports the total number of rows changed across the batch.
+        merged_jobs = max(cursor.rowcount, 0)
+        skipped_jobs = len(jobs) - merged_jobs
 
-        for track in tracks:
-            conn.execute(
-                """INSERT OR IGNORE INTO tracks
-                   (job_id, track_type, track_index, codec, language, title, channels,
-                    width, height, bitrate, original_stream_index)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        conn.executemany(
+            """INSERT OR IGNORE INTO tracks
+               (job_id, track_type, track_index, codec, language, title, channels,
+                width, height, bitrate, original_stream_index)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [
                 (
                     track.get("job_id"),
                     track.get("track_type"),
@@ -719,29 +797,18 @@ def merge_from_export(
                     track.get("height", 0),
                     track.get("bitrate", "0"),
                     track.get("original_stream_index", -1),
-                ),
-            )
+                )
+                for track in tracks
+            ],
+        )
 
-        for segment in segments:
-            source_bot_index = int(segment.get("bot_index", -1))
-            if source_bot_index not in bot_index_map:
-                raise ValueError(f"No bot index mapping for source bot index {source_bot_index}")
-            target_bot_index = bot_index_map[source_bot_index]
-            cursor = conn.execute(
-                """INSERT OR IGNORE INTO segments
-                   (job_id, segment_key, file_id, bot_index, file_size, duration)
-                   VALUES (?, ?, ?, ?, ?, ?)""",
-                (
-                    segment.get("job_id"),
-                    segment.get("segment_key"),
-                    segment.get("file_id"),
-                    target_bot_index,
-                    segment.get("file_size", 0),
-                    segment.get("duration"),
-                ),
-            )
-            if cursor.rowcount == 1:
-                merged_segments += 1
+        cursor = conn.executemany(
+            """INSERT OR IGNORE INTO segments
+               (job_id, segment_key, file_id, bot_index, file_size, duration)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            segment_rows,
+        )
+        merged_segments = max(cursor.rowcount, 0)
 
     return {
         "merged_jobs": merged_jobs,
@@ -796,54 +863,69 @@ def save_job(job_id, analysis, processing_result, upload_result,
 
             # Save video tracks (ABR tiers)
             orig_video_idx = video.index if video else -1
-            for i, (_, _, width, height, bitrate) in enumerate(processing_result.video_playlists):
-                conn.execute(
-                    """INSERT OR REPLACE INTO tracks
-                       (job_id, track_type, track_index, codec, language, title, channels, width, height, bitrate, original_stream_index)
-                       VALUES (?, 'video', ?, ?, 'und', ?, 0, ?, ?, ?, ?)""",
-                    (job_id, i, video.codec_name if video else "h264",
-                     f"{width}x{height}", width, height, bitrate, orig_video_idx),
-                )
+            video_codec = video.codec_name if video else "h264"
+            conn.executemany(
+                """INSERT OR REPLACE INTO tracks
+                   (job_id, track_type, track_index, codec, language, title, channels, width, height, bitrate, original_stream_index)
+                   VALUES (?, 'video', ?, ?, 'und', ?, 0, ?, ?, ?, ?)""",
+                [
+                    (job_id, i, video_codec, f"{width}x{height}", width, height, bitrate, orig_video_idx)
+                    for i, (_, _, width, height, bitrate) in enumerate(processing_result.video_playlists)
+                ],
+            )
 
             # Save audio tracks
+            audio_rows = []
             for i, (_, _, lang, title, channels) in enumerate(processing_result.audio_playlists):
                 audio = analysis.audio_streams[i] if i < len(analysis.audio_streams) else None
                 orig_audio_idx = audio.index if audio else -1
-                conn.execute(
-                    """INSERT OR REPLACE INTO tracks
-                       (job_id, track_type, track_index, codec, language, title, channels, original_stream_index)
-                       VALUES (?, 'audio', ?, ?, ?, ?, ?, ?)""",
-                    (job_id, i, audio.codec_name if audio else "aac", lang, title, channels, orig_audio_idx),
+                audio_rows.append(
+                    (job_id, i, audio.codec_name if audio else "aac", lang, title, channels, orig_audio_idx)
                 )
+            conn.executemany(
+                """INSERT OR REPLACE INTO tracks
+                   (job_id, track_type, track_index, codec, language, title, channels, original_stream_index)
+                   VALUES (?, 'audio', ?, ?, ?, ?, ?, ?)""",
+                audio_rows,
+            )
 
             # Save subtitle tracks
             # Each tuple is (vtt_path, sub_dir, lang, title, enum_idx, orig_stream_idx).
             # enum_idx is the enumerate index over ALL subtitle streams (including skipped
             # bitmap ones), so it matches the sub_N directory name used by video_processor.
-            for _, _, lang, title, enum_idx, orig_idx in processing_result.subtitle_files:
-                conn.execute(
-                    """INSERT OR REPLACE INTO tracks
-                       (job_id, track_type, track_index, codec, language, title, channels, original_stream_index)
-                       VALUES (?, 'subtitle', ?, 'webvtt', ?, ?, 0, ?)""",
-                    (job_id, enum_idx, lang, title, orig_idx),
-                )
+            conn.executemany(
+                """INSERT OR REPLACE INTO tracks
+                   (job_id, track_type, track_index, codec, language, title, channels, original_stream_index)
+                   VALUES (?, 'subtitle', ?, 'webvtt', ?, ?, 0, ?)""",
+                [
+                    (job_id, enum_idx, lang, title, orig_idx)
+                    for _, _, lang, title, enum_idx, orig_idx in processing_result.subtitle_files
+                ],
+            )
 
             # Save all segment mappings (the critical Telegram file_id references).
             # bot_index is a positional index into the runtime Config.BOTS pool, not a DB FK.
             segment_durations = getattr(processing_result, "segment_durations", {})
-            for key, seg in upload_result.segments.items():
-                dur = segment_durations.get(key)
-                conn.execute(
-                    """INSERT OR REPLACE INTO segments
-                       (job_id, segment_key, file_id, bot_index, file_size, duration)
-                       VALUES (?, ?, ?, ?, ?, ?)""",
-                    (job_id, key, seg.file_id, seg.bot_index, seg.file_size, dur),
-                )
+            conn.executemany(
+                """INSERT OR REPLACE INTO segments
+                   (job_id, segment_key, file_id, bot_index, file_size, duration)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                [
+                    (job_id, key, seg.file_id, seg.bot_index, seg.file_size, segment_durations.get(key))
+                    for key, seg in upload_result.segments.items()
+                ],
+            )
 
     except Exception:
         logger.exception("Failed to save job %s, rolled back transaction", job_id)
         raise
 
+    if len(upload_result.segments) >= _ANALYZE_SEGMENT_THRESHOLD:
+        try:
+            conn.execute("ANALYZE segments")
+        except sqlite3.Error as exc:
+            logger.warning("ANALYZE segments failed after saving job %s: %s", job_id, exc)
+
     logger.info(
         "Saved job %s to database: %d segments, %d tracks",
         job_id, len(upload_result.segments),
@@ -892,19 +974,41 @@ def get_job(job_id):
     return dict(row)
 
 
+def get_job_with_counts(job_id):
+    """Look up a job plus its audio/subtitle track and segment counts.
+
+    Both track counts come from one aggregate over the job's tracks instead of
+    a correlated subquery per track type.
+    """
+    conn = _get_conn()
+    row = conn.execute(
+        """SELECT j.*, t.audio_count, t.subtitle_count, s.segment_count
+           FROM jobs j,
+                (SELECT COALESCE(SUM(track_type = 'audio'), 0) AS audio_count,
+                        COALESCE(SUM(track_type = 'subtitle'), 0) AS subtitle_count
+                 FROM tracks WHERE job_id = :job_id) t,
+                (SELECT COUNT(*) AS segment_count FROM segments WHERE job_id = :job_id) s
+           WHERE j.job_id = :job_id""",
+        {"job_id": job_id},
+    ).fetchone()
+    if not row:
+        return None
+    return dict(row)
+
+
 def get_job_tracks(job_id, track_type=None):
-    """Get all tracks for a job, optionally filtered by type."""
+    """Get all tracks for a job, optionally filtered by type.
+
+    A single statement serves both cases so they share one cached plan; the
+    UNIQUE(job_id, track_type, track_index) index covers the ORDER BY either way.
+    """
     conn = _get_conn()
-    if track_type:
-        rows = conn.execute(
-            "SELECT * FROM tracks WHERE job_id = ? AND track_type = ? ORDER BY track_index",
-            (job_id, track_type),
-        ).fetchall()
-    else:
-        rows = conn.execute(
-            "SELECT * FROM tracks WHERE job_id = ? ORDER BY track_type, track_index",
-            (job_id,),
-        ).fetchall()
+    rows = conn.execute(
+        "SELECT * FROM tracks WHERE job_id = :job_id "
+        "AND (:track_type IS NULL OR track_type = :track_type) "
+        "ORDER BY track_type, track_index",
+        {"job_id": job_id, "track_type": track_type or None},
+    ).fetchall()
     return [dict(r) for r in rows]
 
 
@@ -918,7 +1022,17 @@ def get_segment(job_id, segment_key):
     if not row:
         logger.warning("Segment not found: job_id=%s, segment_key=%s", job_id, segment_key)
         return None
-    return {"file_id": row["file_id"], "bot_index": row["bot_index"]}
+    file_id, bot_index = row
+    return {"file_id": file_id, "bot_index": bot_index}
+
+
+def _prefix_key_bounds(prefix):
+    """Return the [low, high) segment_key range covering '<prefix>/...'.
+
+    A range on segment_key is an index seek on UNIQUE(job_id, segment_key),
+    unlike LIKE, which also treats '_' in prefixes such as 'video_0' as a wildcard.
+    """
+    return f"{prefix}/", f"{prefix}0"  # '0' sorts immediately after '/'
 
 
 def get_segments_for_prefix(job_id, prefix):
@@ -928,11 +1042,33 @@ def get_segments_for_prefix(job_id, prefix):
     """
     conn = _get_conn()
     rows = conn.execute(
-        "SELECT segment_key, duration, file_id, bot_index FROM segments WHERE job_id = ? AND segment_key LIKE ? ORDER BY segment_key",
-        (job_id, f"{prefix}/%"),
+        "SELECT segment_key, duration, file_id, bot_index FROM segments "
+        "WHERE job_id = ? AND segment_key >= ? AND segment_key < ? ORDER BY segment_key",
+        (job_id, *_prefix_key_bounds(prefix)),
     ).fetchall()
-    return [{"segment_key": r["segment_key"], "duration": r["duration"],
-             "file_id": r["file_id"], "bot_index": r["bot_index"]} for r in rows]
+    # Unpack positionally: the per-row name lookups on sqlite3.Row dominate
+    # the Python-side cost for segment lists thousands of rows long.
+    return [{"segment_key": key, "duration": duration, "file_id": file_id, "bot_index": bot_index}
+            for key, duration, file_id, bot_index in rows]
+
+
+def get_segment_keys_and_durations(job_id, prefix):
+    """Return (segment_keys, durations) for a prefix as two parallel sorted lists.
+
+    For playlist generation, which only needs these two columns; avoids building
+    a dict per segment as get_segments_for_prefix() does.
+    """
+    conn = _get_conn()
+    cursor = conn.execute(
+        "SELECT segment_key, duration FROM segments "
+        "WHERE job_id = ? AND segment_key >= ? AND segment_key < ? ORDER BY segment_key",
+        (job_id, *_prefix_key_bounds(prefix)),
+    )
+    cursor.row_factory = None
+    columns = list(zip(*cursor))
+    if not columns:
+        return [], []
+    return list(columns[0]), list(columns[1])
 
 
 # ─── Bot round-robin state ────────────────────────────────────────────────────
@@ -942,6 +1078,13 @@ def get_segments_for_prefix(job_id, prefix):
 
 _LAST_BOT_INDEX_KEY = "_last_bot_index"
 
+# Updates an existing settings row in place. INSERT OR REPLACE would delete and
+# re-insert the row on every write, which matters for the per-upload bot index.
+_UPSERT_SETTING_SQL = (
+    "INSERT INTO settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP) "
+    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at"
+)
+
 
 def get_last_bot_index() -> int:
     """Return the bot index last used by the uploader (0 if never set)."""
@@ -962,7 +1105,7 @@ def set_last_bot_index(index: int):
     conn = _get_conn()
     with conn:
         conn.execute(
-            "INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)",
+            _UPSERT_SETTING_SQL,
             (_LAST_BOT_INDEX_KEY, str(int(index))),
         )
 
@@ -1236,15 +1379,15 @@ def delete_old_jobs(older_than_days):
     """
     if older_than_days <= 0:
         return 0
-    cutoff_ts = time.time() - older_than_days * 86400
-    # SQLite stores CURRENT_TIMESTAMP as 'YYYY-MM-DD HH:MM:SS' UTC.
-    # We compare using unixepoch() which is available in SQLite 3.38+; fall back
-    # to a string comparison against an ISO-8601 representation for older SQLite.
+    # created_at holds CURRENT_TIMESTAMP text ('YYYY-MM-DD HH:MM:SS' UTC), which
+    # sorts chronologically. Comparing the bare column against a bound modifier
+    # keeps one cached statement for every retention period and lets SQLite
+    # use idx_jobs_created_at instead of evaluating strftime() per row.
     conn = _get_conn()
     with conn:
         cursor = conn.execute(
-            "DELETE FROM jobs WHERE strftime('%s', created_at) < ?",
-            (str(int(cutoff_ts)),),
+            "DELETE FROM jobs WHERE created_at < datetime('now', ?)",
+            (f"-{older_than_days} days",),
         )
     count = cursor.rowcount
     if count:
@@ -1270,7 +1413,7 @@ def set_setting(key: str, value: str):
     conn = _get_conn()
     with conn:
         conn.execute(
-            "INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)",
+            _UPSERT_SETTING_SQL,
             (key, value),
         )
 
@@ -1278,7 +1421,7 @@ def set_setting(key: str, value: str):
 def set_settings(mapping: dict):
     """Bulk upsert multiple settings in a single transaction."""
     from config import Config  # noqa: PLC0415
-    allowed_keys = set(Config.setting_type_map().keys())
+    allowed_keys = Config.setting_type_map()
     unknown_keys = [k for k in mapping if k not in allowed_keys]
     if unknown_keys:
         raise ValueError(f"Unknown setting keys: {sorted(unknown_keys)}")
@@ -1286,7 +1429,7 @@ def set_settings(mapping: dict):
     conn = _get_conn()
     with conn:
         conn.executemany(
-            "INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)",
+            _UPSERT_SETTING_SQL,
             [(k, v) for k, v in mapping.items()],
         )
 
@@ -1298,6 +1441,13 @@ def delete_setting(key: str):
         conn.execute("DELETE FROM settings WHERE key = ?", (key,))
 
 
+def delete_settings(keys):
+    """Remove several settings in a single transaction."""
+    conn = _get_conn()
+    with conn:
+        conn.executemany("DELETE FROM settings WHERE key = ?", [(k,) for k in keys])
+
+
 # ─── Bots CRUD ────────────────────────────────────────────────────────────────
 
 def get_all_bots() -> list:
@@ -9,7 +9,6 @@ All job/segment data is stored in SQLite via the database module.
 import functools
 import logging
 import math
-import os
 from urllib.parse import quote
 
 import database as db
@@ -140,8 +139,12 @@ def generate_master_playlist(job_id, base_url):
     if not job:
         return None
 
-    audio_tracks = db.get_job_tracks(job_id, "audio")
-    subtitle_tracks = db.get_job_tracks(job_id, "subtitle")
+    # One query for every track type instead of one round trip per type.
+    tracks_by_type = {"video": [], "audio": [], "subtitle": []}
+    for track in db.get_job_tracks(job_id):
+        tracks_by_type.setdefault(track["track_type"], []).append(track)
+    audio_tracks = tracks_by_type["audio"]
+    subtitle_tracks = tracks_by_type["subtitle"]
 
     lines = ["#EXTM3U", "#EXT-X-VERSION:4"]
     audio_group = "audio"
@@ -176,7 +179,7 @@ def generate_master_playlist(job_id, base_url):
         )
 
     # Video variant streams (one per quality tier)
-    video_tracks = db.get_job_tracks(job_id, "video")
+    video_tracks = tracks_by_type["video"]
     video_group = "video"
     duration = job["duration"]
 
@@ -334,13 +337,13 @@ def generate_media_playlist(job_id, stream_type, stream_index=None):
     else:
         return None
 
-    # Query segments from database (now includes durations)
-    segments = db.get_segments_for_prefix(job_id, prefix)
-    if not segments:
+    # Query segment keys and durations from database
+    segment_keys, raw_durations = db.get_segment_keys_and_durations(job_id, prefix)
+    if not segment_keys:
         return None
 
     fallback = Config.HLS_SEGMENT_DURATION
-    durations = [_resolve_segment_duration(s["duration"], fallback) for s in segments]
+    durations = [_resolve_segment_duration(d, fallback) for d in raw_durations]
     target_duration = math.ceil(max(durations)) if durations else fallback
 
     lines = [
@@ -352,10 +355,10 @@ def generate_media_playlist(job_id, stream_type, stream_index=None):
     ]
 
     emitted_segments = 0
-    for seg, dur in zip(segments, durations):
-        segment_uri = _sanitize_segment_uri_path(seg["segment_key"])
+    for segment_key, dur in zip(segment_keys, durations):
+        segment_uri = _sanitize_segment_uri_path(segment_key)
         if not segment_uri:
-            logger.warning("Skipping unsafe segment key for job %s: %r", job_id, seg["segment_key"])
+            logger.warning("Skipping unsafe segment key for job %s: %r", job_id, segment_key)
             continue
         lines.append(f"#EXTINF:{dur:.6f},")
         lines.append(f"/segment/{job_id}/{segment_uri}")
@@ -430,12 +433,12 @@ def generate_virtual_media_playlist(job_id, target_height):
     if tier_bitrate is None:
         return None
 
-    segments = db.get_segments_for_prefix(job_id, "video_0")
-    if not segments:
+    segment_keys, raw_durations = db.get_segment_keys_and_durations(job_id, "video_0")
+    if not segment_keys:
         return None
 
     fallback = Config.HLS_SEGMENT_DURATION
-    durations = [_resolve_segment_duration(s["duration"], fallback) for s in segments]
+    durations = [_resolve_segment_duration(d, fallback) for d in raw_durations]
     target_duration = math.ceil(max(durations)) if durations else fallback
 
     lines = [
@@ -447,8 +450,8 @@ def generate_virtual_media_playlist(job_id, target_height):
     ]
 
     emitted = 0
-    for seg, dur in zip(segments, durations):
-        filename = seg["segment_key"].split("/", 1)[-1]
+    for segment_key, dur in zip(segment_keys, durations):
+        filename = segment_key.split("/", 1)[-1]
         virtual_key = f"virtual_{target_height}p/{filename}"
         segment_uri = _sanitize_segment_uri_path(virtual_key)
         if not segment_uri:
@@ -7,7 +7,6 @@ storing file_ids for later retrieval during streaming.
 import asyncio
 import logging
 import os
-import re
 import tempfile
 import threading
 import time
@@ -48,7 +47,7 @@ except ImportError:  # pragma: no cover - fallback for minimal test environments
     class TimedOut(Exception):  # type: ignore[no-redef]
         pass
 
-from config import Config
+from config import Config, is_valid_file_id
 
 logger = logging.getLogger(__name__)
 
@@ -106,6 +105,8 @@ class TelegramUploader:
                 "index": i,
             })
         self._bot_counter = self._load_bot_counter()
+        # Counter value last written to the DB; persisting is skipped when unchanged.
+        self._persisted_bot_counter = self._bot_counter
         # Locks are created lazily inside the event loop to support Python 3.8/3.9,
         # where asyncio.Lock() cannot be created outside a running event loop.
         self._bot_locks: list | None = None
@@ -189,6 +190,7 @@ class TelegramUploader:
         with self._bot_state_lock:
             self.bots = new_bots
             self._bot_counter = self._load_bot_counter()
+            self._persisted_bot_counter = self._bot_counter
             self._bot_locks = None  # will be recreated lazily on next use
             bot_count = len(self.bots)
         logger.info("Reloaded %d Telegram bots", bot_count)
@@ -286,14 +288,15 @@ class TelegramUploader:
         """Upload a single file to Telegram with retry logic."""
         self._raise_if_cancelled(cancel_event)
         
-        if not os.path.exists(file_path):
+        try:
+            file_size = os.stat(file_path).st_size
+        except FileNotFoundError:
             self._raise_if_cancelled(cancel_event)
-            raise FileNotFoundError(f"Segment file {file_path} not found")
+            raise FileNotFoundError(f"Segment file {file_path} not found") from None
 
         bot = bot_entry["bot"]
         channel_id = bot_entry["channel_id"]
         file_name = os.path.basename(file_path)
-        file_size = os.path.getsize(file_path)
 
         if file_size > Config.TELEGRAM_MAX_FILE_SIZE:
             raise RuntimeError(
@@ -444,75 +447,64 @@ class TelegramUploader:
         Handles video segments, audio track segments, and subtitle files.
         """
         result = UploadResult(processing_result.job_id)
-        total_files = 0
-        uploaded_files = 0
 
-        # Collect all files to upload first to avoid double listdir()
-        # and to get accurate total count
-        all_upload_tasks = []
+        # Collect every file first and upload them as one batch, so the bot pool
+        # stays busy across tier/track boundaries instead of draining at the end
+        # of each directory before the next one starts.
+        files = []
 
         # 1. Video files
         for i, (_, tier_dir, _, _, _) in enumerate(processing_result.video_playlists):
-            video_files = [
+            files.extend(
                 (f"video_{i}/{filename}", os.path.join(tier_dir, filename))
                 for filename in sorted(os.listdir(tier_dir))
                 if filename.endswith(".ts")
-            ]
-            all_upload_tasks.append(("video", video_files))
-            total_files += len(video_files)
+            )
 
         # 2. Audio files
         for i, (_, audio_dir, _, _, _) in enumerate(processing_result.audio_playlists):
-            audio_files = [
+            files.extend(
                 (f"audio_{i}/{filename}", os.path.join(audio_dir, filename))
                 for filename in sorted(os.listdir(audio_dir))
                 if filename.endswith(".ts")
-            ]
-            all_upload_tasks.append(("audio", audio_files))
-            total_files += len(audio_files)
+            )
 
         # 3. Subtitle files
-        subtitle_files = [
+        files.extend(
             (f"sub_{enum_idx}/subtitles.vtt", vtt_path)
             for vtt_path, _, _, _, enum_idx, _ in processing_result.subtitle_files
-        ]
-        all_upload_tasks.append(("sub", subtitle_files))
-        total_files += len(subtitle_files)
+        )
 
         # 4. Thumbnail (optional)
         thumbnail_path = getattr(processing_result, "thumbnail_path", None)
         if thumbnail_path and isinstance(thumbnail_path, str) and os.path.exists(thumbnail_path):
-            all_upload_tasks.append(("thumbnail", [("thumbnail/thumbnail.jpg", thumbnail_path)]))
-            total_files += 1
+            files.append(("thumbnail/thumbnail.jpg", thumbnail_path))
 
-        def on_segment(current, total, name):
-            nonlocal uploaded_files
-            uploaded_files += 1
-            if progress_callback:
-                progress_callback(uploaded_files, total_files, name)
-
-        # Execute uploads using the pre-collected lists
-        for category, file_list in all_upload_tasks:
-            self._raise_if_cancelled(cancel_event)
-            if not file_list:
-                continue
-            category_segments = await self.upload_files(
-                file_list,
-                on_segment,
+        self._raise_if_cancelled(cancel_event)
+        if files:
+            result.segments.update(await self.upload_files(
+                files,
+                progress_callback,
                 cancel_event=cancel_event,
-            )
-            result.segments.update(category_segments)
+            ))
 
         result.total_files = len(result.segments)
         result.total_bytes = sum(s.file_size for s in result.segments.values())
 
         # Persist the round-robin counter so the next upload (or after a restart)
         # continues from where we left off rather than resetting to bot 0.
+        # Skipped when the counter has not moved (e.g. a single bot), so only
+        # real changes cost a settings write.
         try:
             import database  # noqa: PLC0415
             with self._bot_state_lock:
-                last_used = (self._bot_counter - 1) % max(len(self.bots), 1)
-            database.set_last_bot_index(last_used)
+                counter = self._bot_counter
+                changed = counter != self._persisted_bot_counter
+                last_used = (counter - 1) % max(len(self.bots), 1)
+            if changed:
+                database.set_last_bot_index(last_used)
+                with self._bot_state_lock:
+                    self._persisted_bot_counter = counter
         except Exception as exc:
             logger.warning("Could not persist last bot index: %s", exc)
 
@@ -559,8 +551,7 @@ class TelegramUploader:
         The bot_index must match the bot that originally uploaded the file,
         since Telegram file_ids are only valid for the bot that created them.
         """
-        # Telegram file_id validation (no whitespace/newlines)
-        if not file_id or not re.match(r"^[a-zA-Z0-9_-]{50,255}$", str(file_id)):
+        if not is_valid_file_id(file_id):
             raise ValueError("Invalid or malformed Telegram file_id")
 
         if bot_index < 0 or bot_index >= len(self.bots):
@@ -574,8 +565,7 @@ class TelegramUploader:
 
     async def get_file_bytes(self, file_id, bot_index, retries=3):
         """Download bytes for a file using the same bot that uploaded it."""
-        # Telegram file_id validation (no whitespace/newlines)
-        if not file_id or not re.match(r"^[a-zA-Z0-9_-]{50,255}$", str(file_id)):
+        if not is_valid_file_id(file_id):
             raise ValueError("Invalid or malformed Telegram file_id")
 
         if bot_index < 0 or bot_index >= len(self.bots):
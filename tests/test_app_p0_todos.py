@@ -1,4 +1,5 @@
 import os
+import shutil
 import sys
 import tempfile
 import threading
@@ -6,6 +7,7 @@ import time
 import types
 import unittest
 import io
+import json
 import concurrent.futures
 from unittest.mock import AsyncMock, Mock, PropertyMock, patch, ANY
 
@@ -76,6 +78,7 @@ def _reset_state():
     for future in futures:
         future.cancel()
     app_module._last_player_segment.clear()
+    app_module._forget_prefetch_segments()
     app_module._watch_candidates.clear()
     app_module._watch_claimed_paths.clear()
     app_module._watch_failed_signatures.clear()
@@ -205,6 +208,14 @@ class TestP0TodoFixes(unittest.TestCase):
                 ip = app_module._get_client_ip()
         self.assertEqual(ip, "9.9.9.9")
 
+    def test_is_trusted_proxy_follows_runtime_cidr_changes(self):
+        with patch.object(app_module.Config, "TRUSTED_PROXY_CIDRS", ["10.0.0.0/8", "bogus"]):
+            self.assertTrue(app_module._is_trusted_proxy("10.1.2.3"))
+            self.assertFalse(app_module._is_trusted_proxy("192.168.1.1"))
+        with patch.object(app_module.Config, "TRUSTED_PROXY_CIDRS", ["192.168.0.0/16"]):
+            self.assertTrue(app_module._is_trusted_proxy("192.168.1.1"))
+            self.assertFalse(app_module._is_trusted_proxy("10.1.2.3"))
+
     # ─── _is_origin_allowed ───
 
     def test_is_origin_allowed_empty_origin(self):
@@ -307,21 +318,21 @@ class TestP0TodoFixes(unittest.TestCase):
 
     def test_api_db_export_uploads_payload_and_returns_counts(self):
         exported = {
-            "version": 1,
-            "jobs": [{"job_id": "j1"}, {"job_id": "j2"}],
-            "tracks": [{"job_id": "j1"}],
-            "segments": [{"job_id": "j1"}, {"job_id": "j2"}, {"job_id": "j2"}],
+            "jobs": ('[{"job_id":"j1"},{"job_id":"j2"}]', 2),
+            "tracks": ('[{"job_id":"j1"}]', 1),
+            "segments": ('[{"job_id":"j1"},{"job_id":"j2"},{"job_id":"j2"}]', 3),
         }
-        with patch.object(app_module.db, "export_to_dict", return_value=exported), \
+        upload_mock = AsyncMock(return_value={"file_id": "A" * 50, "bot_index": 0, "file_size": 123})
+        with patch.object(app_module.db, "export_tables_json", return_value=exported), \
              patch.object(app_module.Config, "BOTS", [{"token": "123:secret", "channel_id": -1001}]), \
-             patch.object(
-                 app_module._telegram_uploader,
-                 "upload_document",
-                 new=AsyncMock(return_value={"file_id": "A" * 50, "bot_index": 0, "file_size": 123}),
-             ):
+             patch.object(app_module._telegram_uploader, "upload_document", new=upload_mock):
             response = self.client.post("/api/db/export")
 
         self.assertEqual(response.status_code, 200)
+        uploaded = json.loads(upload_mock.await_args.args[0].decode("utf-8"))
+        self.assertEqual(uploaded["version"], 1)
+        self.assertEqual(uploaded["jobs"], [{"job_id": "j1"}, {"job_id": "j2"}])
+        self.assertEqual(len(uploaded["segments"]), 3)
         payload = response.get_json()
         self.assertEqual(payload["file_id"], "A" * 50)
         self.assertEqual(payload["job_count"], 2)
@@ -694,6 +705,7 @@ class TestP0TodoFixes(unittest.TestCase):
         self.assertEqual(kwargs.get("season_number"), 2)
         self.assertEqual(kwargs.get("episode_number"), 5)
         self.assertEqual(kwargs.get("part_number"), 3)
+        self.assertEqual(kwargs.get("file_size"), 4)
 
     @patch("app._queue_local_file")
     def test_upload_finalize_accepts_new_media_types(self, mock_queue):
@@ -903,6 +915,84 @@ class TestP0TodoFixes(unittest.TestCase):
         self.assertTrue(runtime.cancel_event.is_set())
         self.assertEqual(app_module._active_jobs[job_id]["status"], "error")
 
+    def test_process_job_releases_encode_slot_when_process_raises(self):
+        from types import SimpleNamespace
+
+        job_id = "encode_slot_job"
+        app_module._active_jobs[job_id] = {
+            "status": "processing",
+            "file_size": 0,
+            "media_type": "movie",
+            "series_name": None,
+            "is_series": False,
+            "season_number": None,
+            "episode_number": None,
+            "part_number": None,
+        }
+        fake_analysis = SimpleNamespace(
+            file_path="/tmp/fake.mp4",
+            has_video=True,
+            duration=10.0,
+            video_streams=[SimpleNamespace(index=0)],
+            audio_streams=[],
+            subtitle_streams=[],
+            summary=lambda: {"video": 1},
+        )
+        slots = threading.BoundedSemaphore(1)
+
+        with patch("app._encode_slots", slots), \
+             patch("app._bots_configured", return_value=True), \
+             patch("app._check_disk_space", return_value=(True, "")), \
+             patch("app.analyze", return_value=fake_analysis), \
+             patch("app.process", side_effect=RuntimeError("ffmpeg boom")):
+            app_module._process_job(job_id, "/tmp/fake.mp4")
+
+        self.assertEqual(app_module._active_jobs[job_id]["status"], "error")
+        self.assertTrue(slots.acquire(blocking=False))
+
+    def test_process_job_stops_waiting_for_encode_slot_when_cancelled(self):
+        from types import SimpleNamespace
+
+        job_id = "encode_wait_job"
+        app_module._active_jobs[job_id] = {
+            "status": "processing",
+            "file_size": 0,
+            "media_type": "movie",
+            "series_name": None,
+            "is_series": False,
+            "season_number": None,
+            "episode_number": None,
+            "part_number": None,
+        }
+        fake_analysis = SimpleNamespace(
+            file_path="/tmp/fake.mp4",
+            has_video=True,
+            duration=10.0,
+            video_streams=[SimpleNamespace(index=0)],
+            audio_streams=[],
+            subtitle_streams=[],
+            summary=lambda: {"video": 1},
+        )
+
+        def busy_acquire(blocking=True, timeout=None):
+            if timeout is not None:
+                # The job is cancelled while it waits for a slot.
+                app_module._active_jobs[job_id]["cancelled"] = True
+            return False
+
+        slots = Mock()
+        slots.acquire.side_effect = busy_acquire
+
+        with patch("app._encode_slots", slots), \
+             patch("app._bots_configured", return_value=True), \
+             patch("app._check_disk_space", return_value=(True, "")), \
+             patch("app.analyze", return_value=fake_analysis), \
+             patch("app.process") as mock_process:
+            app_module._process_job(job_id, "/tmp/fake.mp4")
+
+        mock_process.assert_not_called()
+        slots.release.assert_not_called()
+
     # ─── /api/jobs/<job_id> DELETE ───
 
     def test_delete_job_not_in_db(self):
@@ -1093,6 +1183,41 @@ class TestP0TodoFixes(unittest.TestCase):
         self.assertIs(state.stream_queue.get(), app_module._STREAM_EOF)
         self.assertIsNone(state.temp_path)
 
+    def test_enqueue_stream_item_async_skips_thread_hop_when_queue_has_room(self):
+        state = app_module._SegmentDownloadState("job1/video/seg.ts", enable_stream=True)
+        with patch.object(app_module.asyncio, "to_thread") as to_thread:
+            ok = app_module._run_async(app_module._enqueue_stream_item_async(state, b"abc"))
+        self.assertTrue(ok)
+        to_thread.assert_not_called()
+        self.assertEqual(state.stream_queue.get_nowait(), b"abc")
+
+    def test_enqueue_stream_item_async_drops_items_after_abandon(self):
+        state = app_module._SegmentDownloadState("job1/video/seg.ts", enable_stream=True)
+        state.stream_abandoned.set()
+        ok = app_module._run_async(app_module._enqueue_stream_item_async(state, b"abc"))
+        self.assertFalse(ok)
+        self.assertTrue(state.stream_queue.empty())
+
+    def test_abandon_stream_wakes_producer_blocked_on_full_queue(self):
+        state = app_module._SegmentDownloadState("job1/video/seg.ts", enable_stream=True)
+        while not state.stream_queue.full():
+            state.stream_queue.put_nowait(b"x")
+        results = []
+        producer = threading.Thread(
+            target=lambda: results.append(app_module._enqueue_stream_item(
+                state.stream_queue, state.stream_abandoned, b"late",
+            )),
+        )
+        producer.start()
+        app_module._abandon_stream(state)
+        producer.join(timeout=2)
+
+        self.assertFalse(producer.is_alive())
+        self.assertTrue(state.stream_abandoned.is_set())
+        self.assertFalse(app_module._enqueue_stream_item(
+            state.stream_queue, state.stream_abandoned, b"after",
+        ))
+
     def test_download_segment_to_state_failure_cleans_up_registry(self):
         cache_key = "job1/video/seg.ts"
         state = app_module._SegmentDownloadState(cache_key, enable_stream=True)
@@ -1211,6 +1336,39 @@ class TestP0TodoFixes(unittest.TestCase):
         batch = call_soon.call_args[0][1]
         self.assertEqual([s["segment_key"] for s in batch], ["video/video_0004.ts"])
 
+    def test_record_player_segment_evicts_least_recent_stream(self):
+        with patch.object(app_module, "_LAST_PLAYER_SEGMENT_MAX", 2):
+            app_module._record_player_segment("job1", "video_0", "video_0/a.ts")
+            app_module._record_player_segment("job2", "video_0", "video_0/a.ts")
+            app_module._record_player_segment("job1", "video_0", "video_0/b.ts")
+            app_module._record_player_segment("job3", "video_0", "video_0/a.ts")
+        self.assertEqual(
+            list(app_module._last_player_segment.items()),
+            [(("job1", "video_0"), "video_0/b.ts"), (("job3", "video_0"), "video_0/a.ts")],
+        )
+
+    def test_prefetch_segment_list_is_read_once_within_ttl(self):
+        segments = [
+            {"segment_key": "video_0/video_0001.ts", "duration": 4, "file_id": "fid1", "bot_index": 0},
+        ]
+        with patch("app.db.get_segments_for_prefix", return_value=segments) as get_segments:
+            expected = (segments, {"video_0/video_0001.ts": 0})
+            self.assertEqual(app_module._get_prefetch_segments("job1", "video_0"), expected)
+            self.assertEqual(app_module._get_prefetch_segments("job1", "video_0"), expected)
+            self.assertEqual(get_segments.call_count, 1)
+            with patch.object(app_module, "_PREFETCH_SEGMENT_LIST_TTL_SECONDS", 0):
+                app_module._get_prefetch_segments("job1", "video_0")
+        self.assertEqual(get_segments.call_count, 2)
+
+    def test_forget_prefetch_segments_drops_only_that_job(self):
+        with patch("app.db.get_segments_for_prefix", return_value=[{"segment_key": "video_0/a.ts"}]) as get_segments:
+            app_module._get_prefetch_segments("job1", "video_0")
+            app_module._get_prefetch_segments("job2", "video_0")
+            app_module._forget_prefetch_segments("job1")
+            app_module._get_prefetch_segments("job1", "video_0")
+            app_module._get_prefetch_segments("job2", "video_0")
+        self.assertEqual(get_segments.call_count, 3)
+
     def test_schedule_segment_prefetch_skips_non_video_segments(self):
         with patch.object(app_module.Config, "SEGMENT_PREFETCH_COUNT", 3), \
              patch("app.db.get_segments_for_prefix") as get_segments:
@@ -1291,6 +1449,38 @@ class TestP0TodoFixes(unittest.TestCase):
 
         mock_sched.assert_called_once_with("job1", "video_0/video_0001.ts", _from_chain=True)
 
+    def test_batch_prefetch_schedules_chain_off_event_loop(self):
+        segments = [
+            {"job_id": "job1", "segment_key": "video_0/video_0002.ts", "file_id": "fid2", "bot_index": 0},
+        ]
+        with app_module._last_player_segment_lock:
+            app_module._last_player_segment[("job1", "video_0")] = "video_0/video_0001.ts"
+        seen_threads = []
+
+        with patch("app._schedule_segment_prefetch",
+                   side_effect=lambda *a, **k: seen_threads.append(threading.current_thread().name)), \
+             patch("app._prefetch_segment_with_info", new=AsyncMock()):
+            app_module._run_async(app_module._batch_prefetch(segments, allow_chain=True))
+
+        self.assertEqual(len(seen_threads), 1)
+        self.assertNotEqual(seen_threads[0], "async-loop")
+
+    def test_build_virtual_segment_reads_cached_tier0_once(self):
+        cache = app_module._SegmentCache(max_bytes=1024)
+        cache.put("job1/video_0/video_0001.ts", b"tier0")
+        with patch("app._segment_cache", cache), \
+             patch("app.get_segment_info", return_value={"file_id": "fid", "bot_index": 0}), \
+             patch("app.transcode_segment", return_value=b"small") as transcode:
+            data = app_module._run_async(
+                app_module._build_virtual_segment("job1", "virtual_480p/video_0001.ts", 480, "1M")
+            )
+
+        self.assertEqual(data, b"small")
+        transcode.assert_called_once_with(b"tier0", 480, "1M")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(cache.get("job1/virtual_480p/video_0001.ts"), b"small")
+
     def test_batch_prefetch_no_chain_when_disallowed(self):
         segments = [
             {"job_id": "job1", "segment_key": "video_0/video_0002.ts", "file_id": "fid2", "bot_index": 0},
@@ -1516,6 +1706,7 @@ class TestP0TodoFixes(unittest.TestCase):
             app_module._normalize_watch_path(video_path),
             filename="clip.mp4",
             source_mode="watch",
+            file_size=5,
         )
 
     def test_watch_scan_queues_all_videos_and_ignores_done_and_partial_files(self):
@@ -1555,6 +1746,92 @@ class TestP0TodoFixes(unittest.TestCase):
             sorted(app_module._normalize_watch_path(path) for path in paths),
         )
 
+    def test_iter_watch_video_files_skips_symlinked_dirs_and_video_named_dirs(self):
+        watch_root = tempfile.mkdtemp(dir=self.temp.name)
+        real_dir = os.path.join(watch_root, "real")
+        os.makedirs(os.path.join(watch_root, "folder.mp4"), exist_ok=True)
+        os.makedirs(real_dir, exist_ok=True)
+        video_path = os.path.join(real_dir, "clip.mp4")
+        with open(video_path, "wb") as handle:
+            handle.write(b"video")
+        os.symlink(real_dir, os.path.join(watch_root, "alias"))
+
+        with patch.object(app_module.Config, "WATCH_ROOT", watch_root), \
+             patch.object(app_module.Config, "WATCH_DONE_DIR", os.path.join(watch_root, "done")), \
+             patch.object(app_module.Config, "WATCH_VIDEO_EXTENSIONS", (".mp4",)), \
+             patch.object(app_module.Config, "WATCH_IGNORE_SUFFIXES", (".part",)):
+            found = [path for path, _ in app_module._iter_watch_video_files()]
+
+        self.assertEqual(found, [app_module._normalize_watch_path(video_path)])
+
+    def test_watch_name_filters_match_suffixes_case_insensitively(self):
+        with patch.object(app_module.Config, "WATCH_VIDEO_EXTENSIONS", (".mp4", ".mkv")), \
+             patch.object(app_module.Config, "WATCH_IGNORE_SUFFIXES", (".part", ".tmp")):
+            self.assertTrue(app_module._is_supported_watch_video("Episode.MKV"))
+            self.assertFalse(app_module._is_supported_watch_video("notes.txt"))
+            self.assertFalse(app_module._is_supported_watch_video("archive_mp4"))
+            self.assertTrue(app_module._is_ignored_watch_path("/watch/clip.mp4.PART"))
+            self.assertTrue(app_module._is_ignored_watch_path("/watch/.hidden.mp4"))
+            self.assertFalse(app_module._is_ignored_watch_path("/watch/clip.mp4"))
+
+    def test_iter_watch_video_files_resolves_only_symlinked_files(self):
+        watch_root = tempfile.mkdtemp(dir=self.temp.name)
+        target_dir = tempfile.mkdtemp(dir=self.temp.name)
+        target = os.path.join(target_dir, "real.mp4")
+        plain = os.path.join(watch_root, "plain.mp4")
+        for path in (target, plain):
+            with open(path, "wb") as handle:
+                handle.write(b"video")
+        os.symlink(target, os.path.join(watch_root, "link.mp4"))
+
+        with patch.object(app_module.Config, "WATCH_ROOT", watch_root), \
+             patch.object(app_module.Config, "WATCH_DONE_DIR", os.path.join(watch_root, "done")), \
+             patch.object(app_module.Config, "WATCH_VIDEO_EXTENSIONS", (".mp4",)), \
+             patch.object(app_module.Config, "WATCH_IGNORE_SUFFIXES", (".part",)), \
+             patch("app._normalize_watch_path", wraps=app_module._normalize_watch_path) as normalize:
+            found = sorted(path for path, _ in app_module._iter_watch_video_files())
+
+        self.assertEqual(
+            found,
+            sorted(app_module._normalize_watch_path(path) for path in (target, plain)),
+        )
+        # One call for the root, one for done/, one for the symlinked file.
+        self.assertEqual(normalize.call_count, 3)
+
+    def test_iter_watch_video_files_yields_stat_signature(self):
+        watch_root = tempfile.mkdtemp(dir=self.temp.name)
+        video_path = os.path.join(watch_root, "clip.mp4")
+        with open(video_path, "wb") as handle:
+            handle.write(b"video")
+
+        with patch.object(app_module.Config, "WATCH_ROOT", watch_root), \
+             patch.object(app_module.Config, "WATCH_DONE_DIR", os.path.join(watch_root, "done")), \
+             patch.object(app_module.Config, "WATCH_VIDEO_EXTENSIONS", (".mp4",)), \
+             patch.object(app_module.Config, "WATCH_IGNORE_SUFFIXES", (".part",)):
+            found = list(app_module._iter_watch_video_files())
+
+        norm_path = app_module._normalize_watch_path(video_path)
+        self.assertEqual(found, [(norm_path, app_module._watch_file_signature(norm_path))])
+
+    def test_watch_scan_stops_claiming_when_job_backlog_is_full(self):
+        watch_root = tempfile.mkdtemp(dir=self.temp.name)
+        with open(os.path.join(watch_root, "clip.mp4"), "wb") as handle:
+            handle.write(b"video")
+
+        with patch.object(app_module.Config, "WATCH_ENABLED", True), \
+             patch.object(app_module.Config, "WATCH_ROOT", watch_root), \
+             patch.object(app_module.Config, "WATCH_DONE_DIR", os.path.join(watch_root, "done")), \
+             patch.object(app_module.Config, "WATCH_STABLE_SECONDS", 0), \
+             patch.object(app_module.Config, "WATCH_VIDEO_EXTENSIONS", (".mp4",)), \
+             patch.object(app_module.Config, "MAX_CONCURRENT_JOBS", 1), \
+             patch.object(app_module._job_queue, "qsize", return_value=app_module._WATCH_BACKLOG_PER_ENCODE_SLOT), \
+             patch("app._claim_watch_file_if_stable") as claim, \
+             patch("app._queue_local_file") as queue_local:
+            self.assertEqual(app_module._watch_scan_once(), [])
+
+        claim.assert_not_called()
+        queue_local.assert_not_called()
+
     def test_watch_scan_failure_waits_for_file_change_before_retry(self):
         watch_root = tempfile.mkdtemp(dir=self.temp.name)
         done_dir = os.path.join(watch_root, "done")
@@ -1652,6 +1929,31 @@ class TestP0TodoFixes(unittest.TestCase):
         self.assertEqual(settings["watch_root"], watch_root)
         self.assertEqual(settings["watch_done_dir"], os.path.join(watch_root, "done"))
         self.assertTrue(os.path.exists(settings_path))
+        self.assertFalse(os.path.exists(settings_path + ".tmp"))
+        with open(settings_path, "r", encoding="utf-8") as handle:
+            self.assertEqual(json.load(handle)["watch_root"], watch_root)
+
+    def test_persist_watch_settings_removes_temp_file_when_replace_fails(self):
+        settings_dir = tempfile.mkdtemp(dir=self.temp.name)
+        settings_path = os.path.join(settings_dir, "watch_settings.json")
+        with patch.object(app_module, "_WATCH_SETTINGS_PATH", settings_path), \
+             patch("app.os.replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                app_module._persist_watch_settings({"watch_enabled": False})
+        self.assertEqual(os.listdir(settings_dir), [])
+
+    def test_apply_watch_settings_recreates_deleted_watch_dirs(self):
+        settings_path = os.path.join(self.temp.name, "watch_settings.json")
+        watch_root = os.path.join(self.temp.name, "downloads")
+        data = {"watch_enabled": False, "watch_root": watch_root, "watch_done_dir": ""}
+        with patch.object(app_module, "_WATCH_SETTINGS_PATH", settings_path), \
+             patch.object(app_module.Config, "WATCH_ENABLED", False), \
+             patch.object(app_module.Config, "WATCH_ROOT", ""), \
+             patch.object(app_module.Config, "WATCH_DONE_DIR", ""):
+            app_module._apply_watch_settings(data)
+            shutil.rmtree(watch_root)
+            app_module._apply_watch_settings(data)
+        self.assertTrue(os.path.isdir(os.path.join(watch_root, "done")))
 
     def test_watch_settings_get_returns_current_values(self):
         with patch.object(app_module.Config, "WATCH_ENABLED", True), \
@@ -1685,6 +1987,25 @@ class TestP0TodoFixes(unittest.TestCase):
         start_watcher.assert_called_once()
         self.assertTrue(os.path.exists(settings_path))
 
+    def test_watch_settings_post_wakes_watcher_instead_of_scanning_inline(self):
+        settings_path = os.path.join(self.temp.name, "watch_settings.json")
+        app_module._watch_wake_event.clear()
+        with patch.object(app_module, "_WATCH_SETTINGS_PATH", settings_path), \
+             patch("app._start_folder_watcher"), \
+             patch("app._watch_scan_once") as scan_once:
+            resp = self.client.post(
+                "/api/watch-settings",
+                json={
+                    "watch_enabled": True,
+                    "watch_root": os.path.join(self.temp.name, "downloads"),
+                    "watch_done_dir": os.path.join(self.temp.name, "finished"),
+                },
+            )
+        self.assertEqual(resp.status_code, 200)
+        scan_once.assert_not_called()
+        self.assertTrue(app_module._watch_wake_event.is_set())
+        app_module._watch_wake_event.clear()
+
     def test_upload_init_fails_without_bots(self):
         with patch.object(app_module._telegram_uploader, "bots", []):
             resp = self.client.post("/api/upload/init", json={
@@ -1759,6 +2080,27 @@ class TestSegmentCacheStats(unittest.TestCase):
         self.assertEqual(cache.stats()["evictions"], 1)
         self.assertEqual(cache.stats()["items"], 1)
 
+    def test_put_evicts_least_recently_used_first(self):
+        cache = self._make_cache(max_bytes=9)
+        cache.put("a", b"aaa")
+        cache.put("b", b"bbb")
+        cache.put("c", b"ccc")
+        cache.get("a")
+        cache.put("d", b"ddd")
+        self.assertFalse(cache.has("b"))
+        self.assertTrue(cache.has("a"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_put_replacing_key_reuses_its_space(self):
+        cache = self._make_cache(max_bytes=9)
+        cache.put("a", b"aaa")
+        cache.put("b", b"bbb")
+        cache.put("c", b"ccc")
+        cache.put("a", b"AAA")
+        self.assertEqual(cache.get("a"), b"AAA")
+        self.assertEqual(cache.stats()["evictions"], 0)
+        self.assertEqual(cache.current_bytes, 9)
+
     def test_stats_reports_correct_item_count(self):
         cache = self._make_cache()
         cache.put("k1", b"aaa")
@@ -1986,6 +2328,20 @@ class TestThumbnailRoute(unittest.TestCase):
         self.assertEqual(resp.content_type, "image/jpeg")
         self.assertEqual(resp.data, fake_data)
 
+    def test_thumbnail_miss_caches_downloaded_bytes(self):
+        job = {"job_id": "j3", "has_thumbnail": 1}
+        fake_data = bytearray(b"\xff\xd8\xff\xe0" + b"\x01" * 100)
+        segment_info = {"file_id": "abc123" * 10, "bot_index": 0}
+        with patch("app.get_job", return_value=job), \
+             patch("app.get_segment_info", return_value=segment_info), \
+             patch.object(app_module._telegram_uploader, "get_file_bytes", new=AsyncMock(return_value=fake_data)):
+            resp = self.client.get("/thumbnail/j3")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, bytes(fake_data))
+        cached = app_module._segment_cache.get("j3/thumbnail/thumbnail.jpg")
+        self.assertIsInstance(cached, bytes)
+        self.assertEqual(cached, bytes(fake_data))
+
 
 class TestSettingsAPI(unittest.TestCase):
     def setUp(self):
@@ -28,6 +28,59 @@ class TestIntEnv(unittest.TestCase):
         self.assertEqual(val, 7)
 
 
+class TestIsValidFileId(unittest.TestCase):
+    def test_accepts_telegram_style_ids(self):
+        self.assertTrue(config.is_valid_file_id("A" * 50))
+        self.assertTrue(config.is_valid_file_id("BQACAgIAAxkDAAI" + "x_-9" * 10))
+
+    def test_rejects_empty_short_or_whitespace_ids(self):
+        for file_id in (None, "", "A" * 49, "A" * 256, "A" * 50 + "\n", "A" * 25 + " " + "A" * 25):
+            self.assertFalse(config.is_valid_file_id(file_id), repr(file_id))
+
+
+class TestBoolEnv(unittest.TestCase):
+    def test_missing_env_uses_default(self):
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertTrue(config._bool_env("MY_FLAG", True))
+            self.assertFalse(config._bool_env("MY_FLAG", False))
+
+    def test_truthy_spellings(self):
+        for raw in ("true", "TRUE", "1", "yes", " on "):
+            with patch.dict(os.environ, {"MY_FLAG": raw}):
+                self.assertTrue(config._bool_env("MY_FLAG", False), raw)
+
+    def test_falsy_spellings(self):
+        for raw in ("false", "FALSE", "0", "no", " off "):
+            with patch.dict(os.environ, {"MY_FLAG": raw}):
+                self.assertFalse(config._bool_env("MY_FLAG", True), raw)
+
+    def test_unrecognized_values_use_default(self):
+        for raw in ("", "maybe", "enabled"):
+            with patch.dict(os.environ, {"MY_FLAG": raw}):
+                self.assertTrue(config._bool_env("MY_FLAG", True), raw)
+                self.assertFalse(config._bool_env("MY_FLAG", False), raw)
+
+    def test_strict_flags_accept_only_true(self):
+        with patch.dict(os.environ, {"MY_FLAG": "true"}):
+            self.assertTrue(config._bool_env("MY_FLAG", False, strict=True))
+        for raw in ("1", "yes", "on"):
+            with patch.dict(os.environ, {"MY_FLAG": raw}):
+                self.assertFalse(config._bool_env("MY_FLAG", False, strict=True), raw)
+
+    def test_behind_proxy_setting_keeps_true_only_spelling(self):
+        self.assertFalse(config.Config.parse_setting_value("BEHIND_PROXY", "1"))
+        self.assertTrue(config.Config.parse_setting_value("BEHIND_PROXY", "true"))
+        self.assertTrue(config.Config.parse_setting_value("ABR_ENABLED", "yes"))
+
+
+class TestSplitCsv(unittest.TestCase):
+    def test_strips_and_drops_empty_entries(self):
+        self.assertEqual(config._split_csv(" mp4, ,.mkv ,,"), ["mp4", ".mkv"])
+
+    def test_empty_string_returns_empty_list(self):
+        self.assertEqual(config._split_csv(""), [])
+
+
 class TestParseTiers(unittest.TestCase):
     def test_valid_list_format(self):
         result = config._parse_tiers("1080:10M,720:5M,480:2M")
@@ -97,6 +150,13 @@ class TestParseTiers(unittest.TestCase):
         result = config._parse_tiers("720:5.5M")
         self.assertEqual(result, [{"height": 720, "bitrate": "5.5M"}])
 
+    def test_signed_height_and_inner_whitespace(self):
+        result = config._parse_tiers("1080:10M, +720 :5M")
+        self.assertEqual(result, [
+            {"height": 1080, "bitrate": "10M"},
+            {"height": 720, "bitrate": "5M"},
+        ])
+
 
 class TestConfigLoadBots(unittest.TestCase):
     def test_load_bots_empty(self):
@@ -226,6 +286,36 @@ class TestSegmentTargetConfig(unittest.TestCase):
         self.assertEqual(val, 8388608)
 
 
+class TestReadEnvSettings(unittest.TestCase):
+    def test_defaults_when_env_is_empty(self):
+        with patch.dict(os.environ, {}, clear=True):
+            settings = config._read_env_settings()
+        self.assertEqual(settings["PORT"], 5050)
+        self.assertEqual(settings["CORS_ALLOWED_ORIGIN_TUPLES"], [])
+        self.assertEqual(settings["ABR_TIERS"][0], {"height": 1080, "bitrate": "10M"})
+
+    def test_reload_applies_shared_reader(self):
+        original_port = config.Config.PORT
+        self.addCleanup(setattr, config.Config, "PORT", original_port)
+        with patch.dict(os.environ, {"LOCAL_PORT": "6060"}), \
+             patch.object(config, "_apply_dotenv_overrides"), \
+             patch.object(config.Config, "load_bots"), \
+             patch.object(config.Config, "load_from_db"):
+            config.Config.reload()
+        self.assertEqual(config.Config.PORT, 6060)
+
+
+class TestApplyDotenvOverrides(unittest.TestCase):
+    def test_only_changed_keys_are_written(self):
+        values = {"SAME": "1", "CHANGED": "new", "ADDED": "x", "BARE": None}
+        with patch.dict(os.environ, {"SAME": "1", "CHANGED": "old"}, clear=True), \
+             patch.object(config, "dotenv_values", return_value=values):
+            changed = config._apply_dotenv_overrides()
+            env = dict(os.environ)
+        self.assertEqual(changed, {"CHANGED": "new", "ADDED": "x"})
+        self.assertEqual(env, {"SAME": "1", "CHANGED": "new", "ADDED": "x"})
+
+
 class TestWatchConfig(unittest.TestCase):
     def test_watch_config_defaults_done_dir_under_root(self):
         with tempfile.TemporaryDirectory() as tempdir:
@@ -293,9 +383,8 @@ class TestVideoProcessorHelpers(unittest.TestCase):
         # h264_vaapi: list contains it, probe succeeds
         # hevc_vaapi: list does not contain it (not in stdout)
         mock_run.side_effect = [
-            Mock(stdout="h264_vaapi other stuff", returncode=0),  # encoder list for h264
+            Mock(stdout="h264_vaapi other stuff", returncode=0),  # encoder list
             Mock(returncode=0, stderr=""),                         # h264 probe success
-            Mock(stdout="h264_vaapi other stuff", returncode=0),  # encoder list for hevc (not found)
         ]
         with patch.object(vp.Config, "ENABLE_HW_ACCEL", True), \
              patch.object(vp.Config, "PREFERRED_ENCODER", "vaapi"):
@@ -309,9 +398,8 @@ class TestVideoProcessorHelpers(unittest.TestCase):
     def test_detect_hw_encoder_success_both_codecs(self, mock_run):
         # Both h264_vaapi and hevc_vaapi available
         mock_run.side_effect = [
-            Mock(stdout="h264_vaapi hevc_vaapi", returncode=0),  # encoder list for h264
+            Mock(stdout="h264_vaapi hevc_vaapi", returncode=0),  # encoder list
             Mock(returncode=0, stderr=""),                        # h264 probe success
-            Mock(stdout="h264_vaapi hevc_vaapi", returncode=0),  # encoder list for hevc
             Mock(returncode=0, stderr=""),                        # hevc probe success
         ]
         with patch.object(vp.Config, "ENABLE_HW_ACCEL", True), \
@@ -331,26 +419,24 @@ class TestVideoProcessorHelpers(unittest.TestCase):
 
     @patch("video_processor.subprocess.run")
     def test_detect_hw_encoder_result_is_cached(self, mock_run):
-        # h264 found and probed OK; hevc not in list (3 total calls on first invocation)
+        # h264 found and probed OK; hevc not in list (2 total calls on first invocation)
         mock_run.side_effect = [
-            Mock(stdout="h264_vaapi", returncode=0),  # encoder list for h264
+            Mock(stdout="h264_vaapi", returncode=0),  # encoder list, listed once
             Mock(returncode=0, stderr=""),             # h264 probe success
-            Mock(stdout="h264_vaapi", returncode=0),  # encoder list for hevc (not found)
         ]
         with patch.object(vp.Config, "ENABLE_HW_ACCEL", True), \
              patch.object(vp.Config, "PREFERRED_ENCODER", "vaapi"):
             r1 = vp._detect_hw_encoder()
             r2 = vp._detect_hw_encoder()  # second call uses cache
         self.assertIs(r1, r2)
-        self.assertEqual(mock_run.call_count, 3)
+        self.assertEqual(mock_run.call_count, 2)
 
     @patch("video_processor.subprocess.run")
     def test_detect_hw_encoder_probe_failure_falls_back_to_software(self, mock_run):
         # Both h264 and hevc probe fail → result is None
         mock_run.side_effect = [
-            Mock(stdout="h264_vaapi hevc_vaapi", returncode=0),  # encoder list for h264
+            Mock(stdout="h264_vaapi hevc_vaapi", returncode=0),  # encoder list
             Mock(returncode=1, stderr="device init failed"),      # h264 probe fails
-            Mock(stdout="h264_vaapi hevc_vaapi", returncode=0),  # encoder list for hevc
             Mock(returncode=1, stderr="device init failed"),      # hevc probe fails
         ]
         with patch.object(vp.Config, "ENABLE_HW_ACCEL", True), \
@@ -358,6 +444,15 @@ class TestVideoProcessorHelpers(unittest.TestCase):
             result = vp._detect_hw_encoder()
         self.assertIsNone(result)
 
+    @patch("video_processor.subprocess.run")
+    def test_detect_hw_encoder_treats_failed_encoder_listing_as_empty(self, mock_run):
+        mock_run.return_value = Mock(stdout="h264_vaapi hevc_vaapi", returncode=1)
+        with patch.object(vp.Config, "ENABLE_HW_ACCEL", True), \
+             patch.object(vp.Config, "PREFERRED_ENCODER", "vaapi"):
+            result = vp._detect_hw_encoder()
+        self.assertIsNone(result)
+        mock_run.assert_called_once()
+
     @patch("video_processor.subprocess.run")
     def test_detect_hw_encoder_unknown_preferred_returns_none(self, mock_run):
         with patch.object(vp.Config, "ENABLE_HW_ACCEL", True), \
@@ -685,10 +780,23 @@ class TestVideoProcessorHelpers(unittest.TestCase):
         proc.communicate.side_effect = subprocess.TimeoutExpired(cmd=["ffmpeg"], timeout=0.2)
         proc.kill.return_value = None
         mock_popen.return_value = proc
-        with patch("video_processor.time.time", side_effect=[0, 7201]):
+        with patch("video_processor.time.monotonic", side_effect=[0, 7201]):
             with self.assertRaisesRegex(RuntimeError, "FFmpeg timed out"):
                 vp._run_ffmpeg(["ffmpeg"], "desc")
 
+    @patch("video_processor.subprocess.Popen")
+    def test_run_ffmpeg_discards_stdout_and_disables_stats(self, mock_popen):
+        proc = Mock(returncode=0)
+        proc.communicate.return_value = (None, "")
+        mock_popen.return_value = proc
+
+        vp._run_ffmpeg(["ffmpeg", "-i", "in.ts", "out.ts"], "desc")
+
+        args, kwargs = mock_popen.call_args
+        self.assertEqual(args[0], ["ffmpeg", "-nostats", "-i", "in.ts", "out.ts"])
+        self.assertIs(kwargs["stdout"], subprocess.DEVNULL)
+        self.assertIs(kwargs["stderr"], subprocess.PIPE)
+
     @patch("video_processor.subprocess.Popen")
     def test_run_ffmpeg_cancelled_terminates_process(self, mock_popen):
         proc = Mock()
@@ -745,6 +853,61 @@ class TestVideoProcessorHelpers(unittest.TestCase):
 
         proc.terminate.assert_called_once_with()
 
+    @patch("video_processor.subprocess.Popen")
+    def test_run_ffmpeg_with_progress_failure_keeps_stderr_tail(self, mock_popen):
+        proc = Mock()
+        proc.stdout = iter(())
+        proc.stderr = iter(f"line {i}\n" for i in range(500))
+        proc.poll.return_value = 1
+        proc.returncode = 1
+        mock_popen.return_value = proc
+
+        with self.assertRaises(RuntimeError) as ctx:
+            vp._run_ffmpeg_with_progress(
+                ["ffmpeg"], "desc", duration_seconds=10, step_progress_cb=Mock(),
+            )
+
+        message = str(ctx.exception)
+        self.assertIn("line 499\n", message)
+        self.assertNotIn("line 299\n", message)
+
+    @patch("video_processor.subprocess.Popen")
+    def test_run_ffmpeg_with_progress_reads_tail_while_stderr_reader_runs(self, mock_popen):
+        stop = threading.Event()
+        self.addCleanup(stop.set)
+
+        def endless_stderr():
+            i = 0
+            while not stop.is_set():
+                yield f"line {i}\n"
+                i += 1
+
+        proc = Mock()
+        proc.stdout = iter(())
+        proc.stderr = endless_stderr()
+        proc.poll.return_value = 1
+        proc.returncode = 1
+        mock_popen.return_value = proc
+
+        # Joins that return immediately leave the stderr reader appending.
+        with patch.object(threading.Thread, "join"):
+            with self.assertRaisesRegex(RuntimeError, "FFmpeg failed: desc"):
+                vp._run_ffmpeg_with_progress(
+                    ["ffmpeg"], "desc", duration_seconds=10, step_progress_cb=Mock(),
+                )
+
+    def test_check_segment_sizes_reports_only_oversized_ts_files(self):
+        with tempfile.TemporaryDirectory() as segment_dir:
+            for name, size in (("b.ts", 8), ("a.ts", 2), ("c.ts", 9), ("big.vtt", 50)):
+                with open(os.path.join(segment_dir, name), "wb") as handle:
+                    handle.write(b"x" * size)
+            with patch.object(vp.Config, "TELEGRAM_MAX_FILE_SIZE", 4):
+                oversized = vp._check_segment_sizes(segment_dir)
+        self.assertEqual(oversized, [("b.ts", 8), ("c.ts", 9)])
+
+    def test_check_segment_sizes_missing_dir_returns_empty(self):
+        self.assertEqual(vp._check_segment_sizes("/nonexistent/segments"), [])
+
     # ─── ProcessingResult ───
 
     def test_processing_result_video_playlist_property_empty(self):
@@ -1011,6 +1174,44 @@ class TestVideoProcessorHelpers(unittest.TestCase):
                         key, path = files[0]
                         self.assertIn("subtitles.vtt", key)
 
+    @patch("video_processor._reencode_oversized_segment")
+    @patch("video_processor._parse_segment_durations", return_value={"a.ts": 4.0, "b.ts": 6.0})
+    @patch("video_processor._check_segment_sizes")
+    @patch("video_processor._run_ffmpeg_with_progress")
+    @patch("video_processor._run_ffmpeg")
+    @patch("video_processor._detect_hw_encoder", return_value=None)
+    def test_process_copy_mode_reencodes_oversized_segments_in_parallel(
+        self, _detect, _run, _run_with_progress, mock_sizes, _durations, mock_reencode
+    ):
+        mock_sizes.return_value = [("a.ts", 100), ("b.ts", 200)]
+        started = threading.Barrier(2, timeout=5)
+        mock_reencode.side_effect = lambda *args: started.wait()
+        with tempfile.TemporaryDirectory() as proc_dir:
+            with patch.object(vp.Config, "PROCESSING_DIR", proc_dir), \
+                 patch.object(vp.Config, "ABR_ENABLED", False), \
+                 patch.object(vp.Config, "ENABLE_COPY_MODE", True), \
+                 patch.object(vp.Config, "MAX_PARALLEL_ENCODES", 2):
+                analysis = SimpleNamespace(
+                    file_path="/tmp/in.mp4",
+                    has_video=True, can_copy_video=True,
+                    duration=10.0,
+                    video_streams=[SimpleNamespace(index=0, codec_name="h264",
+                                                   is_copy_compatible=True, width=1280, height=720)],
+                    audio_streams=[],
+                    subtitle_streams=[],
+                )
+                vp.process(analysis, "jobreencode")
+
+        # Both calls had to be running at once to get past the barrier.
+        tier_dir = os.path.join(proc_dir, "jobreencode", "video_0")
+        self.assertCountEqual(
+            [c.args for c in mock_reencode.call_args_list],
+            [
+                (os.path.join(tier_dir, "a.ts"), 4.0, None, "h264"),
+                (os.path.join(tier_dir, "b.ts"), 6.0, None, "h264"),
+            ],
+        )
+
     # ─── cleanup() ───
 
     @patch("video_processor._run_ffmpeg_with_progress")
@@ -1124,6 +1325,13 @@ class TestUploadSizeGate(unittest.TestCase):
             self.assertEqual(result.file_size, 100)
 
 
+class TestSettingTypeMap(unittest.TestCase):
+    def test_map_covers_registry_and_is_reused(self):
+        first = config.Config.setting_type_map()
+        self.assertEqual(first, {e[0]: e[2] for e in config.Config.CONFIGURABLE_SETTINGS})
+        self.assertIs(config.Config.setting_type_map(), first)
+
+
 class TestConfigToDict(unittest.TestCase):
     def test_to_dict_has_categories_key(self):
         result = config.Config.to_dict()
@@ -1,3 +1,4 @@
+import json
 import os
 import sqlite3
 import tempfile
@@ -76,6 +77,22 @@ class TestDatabaseConnections(TestDatabaseBase):
         c2 = database._get_conn()
         self.assertIs(c1, c2)
 
+    def test_get_conn_applies_connection_pragmas(self):
+        conn = database._get_conn()
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+        self.assertEqual(conn.execute("PRAGMA foreign_keys").fetchone()[0], 1)
+        self.assertEqual(conn.execute("PRAGMA temp_store").fetchone()[0], 2)  # MEMORY
+        self.assertEqual(conn.execute("PRAGMA cache_size").fetchone()[0], -64000)
+
+    def test_get_conn_enlarges_statement_cache(self):
+        database.close_conn()
+        with patch.object(database.sqlite3, "connect", wraps=sqlite3.connect) as connect:
+            database._get_conn()
+        connect.assert_called_once_with(
+            self.harness.db_path, cached_statements=database._STATEMENT_CACHE_SIZE,
+        )
+
     def test_get_conn_different_threads_different_connections(self):
         conns = []
 
@@ -90,6 +107,45 @@ class TestDatabaseConnections(TestDatabaseBase):
         self.assertIsNotNone(conns[0])
         self.assertIsNot(main_conn, conns[0])
 
+    def test_reader_thread_not_blocked_by_open_write_transaction(self):
+        database.set_setting("VIDEO_BITRATE", "2M")
+        writer = database._get_conn()
+        writer.execute("BEGIN IMMEDIATE")
+        writer.execute(
+            "UPDATE settings SET value = ? WHERE key = ?", ("8M", "VIDEO_BITRATE")
+        )
+        seen = []
+
+        def read():
+            try:
+                seen.append(database.get_all_settings().get("VIDEO_BITRATE"))
+            finally:
+                database.close_conn()
+
+        try:
+            t = threading.Thread(target=read)
+            t.start()
+            t.join(timeout=2)
+            self.assertFalse(t.is_alive())
+            self.assertEqual(seen, ["2M"])
+        finally:
+            writer.rollback()
+
+    def test_close_conn_skips_pragma_optimize(self):
+        conn = database._get_conn()
+        statements = []
+        conn.set_trace_callback(statements.append)
+        database.close_conn()
+        self.assertNotIn("PRAGMA optimize", statements)
+
+    def test_shutdown_sweep_runs_pragma_optimize(self):
+        conn = database._get_conn()
+        statements = []
+        conn.set_trace_callback(statements.append)
+        database._close_all_connections()
+        self.assertIn("PRAGMA optimize", statements)
+        self.assertEqual(database.open_connection_count(), 0)
+
     def test_close_conn_clears_local(self):
         c1 = database._get_conn()
         database.close_conn()
@@ -169,6 +225,7 @@ class TestDatabaseMigrations(TestDatabaseBase):
                 (7, "add_listing_performance_indexes"),
                 (8, "enforce_data_constraints"),
                 (9, "add_bot_index_segment_index"),
+                (10, "add_segment_covering_indexes"),
             ],
         )
 
@@ -270,7 +327,7 @@ class TestDatabaseMigrations(TestDatabaseBase):
         database.init_db()
         conn = database._get_conn()
         rows = conn.execute("SELECT revision FROM schema_migrations ORDER BY revision").fetchall()
-        self.assertEqual([row["revision"] for row in rows], [1, 2, 3, 4, 5, 6, 7, 8, 9])
+        self.assertEqual([row["revision"] for row in rows], [1, 2, 3, 4, 5, 6, 7, 8, 9, 10])
 
     def test_migration_adds_new_indexes(self):
         conn = database._get_conn()
@@ -279,6 +336,21 @@ class TestDatabaseMigrations(TestDatabaseBase):
         self.assertIn("idx_jobs_media_type", index_names)
         self.assertIn("idx_jobs_created_at", index_names)
 
+    def test_bot_workload_stats_uses_covering_index(self):
+        conn = database._get_conn()
+        segment_indexes = {row["name"] for row in conn.execute("PRAGMA index_list(segments)")}
+        self.assertIn("idx_segments_bot_size", segment_indexes)
+        self.assertNotIn("idx_segments_bot_index", segment_indexes)
+        self.assertNotIn("idx_segments_job", segment_indexes)
+
+        plan = " ".join(
+            row["detail"] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT bot_index, COUNT(*), COALESCE(SUM(file_size), 0) "
+                "FROM segments GROUP BY bot_index"
+            )
+        )
+        self.assertIn("COVERING INDEX idx_segments_bot_size", plan)
+
     def test_init_db_fails_for_newer_schema_revision(self):
         self._reset_db_file()
         conn = sqlite3.connect(self.harness.db_path)
@@ -319,6 +391,17 @@ class TestDatabaseCRUD(TestDatabaseBase):
     def test_get_job_missing_returns_none(self):
         self.assertIsNone(database.get_job("nonexistent"))
 
+    def test_get_job_with_counts(self):
+        analysis, processing, upload = self._sample_payload()
+        database.save_job("job1", analysis, processing, upload)
+
+        job = database.get_job_with_counts("job1")
+        self.assertEqual(job["job_id"], "job1")
+        self.assertEqual(job["audio_count"], 1)
+        self.assertEqual(job["subtitle_count"], 1)
+        self.assertEqual(job["segment_count"], 3)
+        self.assertIsNone(database.get_job_with_counts("nonexistent"))
+
     def test_get_job_tracks_all_types(self):
         analysis, processing, upload = self._sample_payload()
         database.save_job("job1", analysis, processing, upload)
@@ -333,6 +416,7 @@ class TestDatabaseCRUD(TestDatabaseBase):
         self.assertEqual(len(database.get_job_tracks("job1", "video")), 1)
         self.assertEqual(len(database.get_job_tracks("job1", "audio")), 1)
         self.assertEqual(len(database.get_job_tracks("job1", "subtitle")), 1)
+        self.assertEqual(len(database.get_job_tracks("job1", "")), 3)
 
     def test_get_job_tracks_video_has_dimensions(self):
         analysis, processing, upload = self._sample_payload()
@@ -370,6 +454,33 @@ class TestDatabaseCRUD(TestDatabaseBase):
         database.save_job("job1", analysis, processing, upload)
         self.assertEqual(database.get_segments_for_prefix("job1", "noexist"), [])
 
+    def test_get_segments_for_prefix_treats_underscore_literally(self):
+        analysis, processing, upload = self._sample_payload()
+        upload.segments = {
+            "video_0/video_0001.ts": SimpleNamespace(file_id="a", bot_index=0, file_size=1),
+            "videoX0/video_0001.ts": SimpleNamespace(file_id="b", bot_index=0, file_size=1),
+            "video_00/video_0001.ts": SimpleNamespace(file_id="c", bot_index=0, file_size=1),
+        }
+        database.save_job("job1", analysis, processing, upload)
+
+        segments = database.get_segments_for_prefix("job1", "video_0")
+        self.assertEqual([s["file_id"] for s in segments], ["a"])
+
+    def test_get_segment_keys_and_durations(self):
+        analysis, processing, upload = self._sample_payload()
+        upload.segments = {
+            "video/video_0002.ts": SimpleNamespace(file_id="f2", bot_index=0, file_size=1),
+            "video/video_0001.ts": SimpleNamespace(file_id="f1", bot_index=0, file_size=1),
+            "audio_0/audio_0001.ts": SimpleNamespace(file_id="f3", bot_index=0, file_size=1),
+        }
+        processing.segment_durations = {"video/video_0001.ts": 4.0, "video/video_0002.ts": 2.5}
+        database.save_job("job1", analysis, processing, upload)
+
+        keys, durations = database.get_segment_keys_and_durations("job1", "video")
+        self.assertEqual(keys, ["video/video_0001.ts", "video/video_0002.ts"])
+        self.assertEqual(durations, [4.0, 2.5])
+        self.assertEqual(database.get_segment_keys_and_durations("job1", "noexist"), ([], []))
+
     def test_list_jobs_includes_counts(self):
         analysis, processing, upload = self._sample_payload()
         database.save_job("job1", analysis, processing, upload)
@@ -456,6 +567,39 @@ class TestDatabaseCRUD(TestDatabaseBase):
         self.assertEqual(count, 0)
         self.assertIsNotNone(database.get_job("job1"))
 
+    def test_delete_old_jobs_removes_only_jobs_past_cutoff(self):
+        for job_id in ("job_old", "job_new"):
+            analysis, processing, upload = self._sample_payload(job_id)
+            database.save_job(job_id, analysis, processing, upload)
+        conn = database._get_conn()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET created_at = datetime('now', '-10 days') WHERE job_id = ?",
+                ("job_old",),
+            )
+
+        count = database.delete_old_jobs(7)
+
+        self.assertEqual(count, 1)
+        self.assertIsNone(database.get_job("job_old"))
+        self.assertIsNotNone(database.get_job("job_new"))
+
+    def test_save_job_analyzes_segments_after_large_ingest(self):
+        analysis, processing, upload = self._sample_payload()
+        conn = database._get_conn()
+        database.save_job("job_small", analysis, processing, upload)
+        self.assertIsNone(conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+        ).fetchone())
+
+        upload.segments = {
+            f"video/video_{i:04d}.ts": SimpleNamespace(file_id=f"f{i}", bot_index=i % 2, file_size=100)
+            for i in range(database._ANALYZE_SEGMENT_THRESHOLD)
+        }
+        database.save_job("job_large", analysis, processing, upload)
+        stats = conn.execute("SELECT tbl FROM sqlite_stat1 WHERE tbl = 'segments'").fetchall()
+        self.assertTrue(stats)
+
     def test_save_job_no_video(self):
         analysis = SimpleNamespace(
             file_path="/tmp/audio_only.mp4",
@@ -593,6 +737,15 @@ class TestHLSManagerWithDB(TestDatabaseBase):
         self.assertIn('/hls/job4/video_0.m3u8', playlist)
         self.assertIn("https://cdn.example", playlist)
 
+    def test_generate_master_playlist_loads_tracks_in_one_query(self):
+        analysis, processing, upload = self._sample_payload()
+        hls_manager.register_job("job4", analysis, processing, upload)
+        with patch.object(hls_manager.db, "get_job_tracks", wraps=database.get_job_tracks) as get_tracks:
+            playlist = hls_manager.generate_master_playlist("job4", "https://cdn.example")
+        get_tracks.assert_called_once_with("job4")
+        self.assertIn('/hls/job4/video_0.m3u8', playlist)
+        self.assertIn('/hls/job4/audio_0.m3u8', playlist)
+
     def test_generate_master_playlist_missing_job(self):
         self.assertIsNone(hls_manager.generate_master_playlist("missing", "https://cdn.example"))
 
@@ -1106,6 +1259,18 @@ class TestDatabaseExportMerge(TestDatabaseBase):
         self.assertEqual(len(exported["tracks"]), 3)
         self.assertEqual(len(exported["segments"]), 3)
 
+    def test_export_tables_json_matches_export_to_dict(self):
+        analysis, processing, upload = self._sample_payload("job_export")
+        database.save_job("job_export", analysis, processing, upload)
+
+        exported = database.export_to_dict()
+        tables = database.export_tables_json()
+
+        self.assertEqual(list(tables), ["jobs", "tracks", "segments"])
+        for name, (array_json, count) in tables.items():
+            self.assertEqual(json.loads(array_json), exported[name])
+            self.assertEqual(count, len(exported[name]))
+
     def test_merge_from_export_remaps_bot_indexes_and_skips_existing_jobs(self):
         analysis, processing, upload = self._sample_payload("job_existing")
         database.save_job("job_existing", analysis, processing, upload)
@@ -1236,6 +1401,19 @@ class TestSettingsCRUD(TestDatabaseBase):
         result = database.get_all_settings()
         self.assertEqual(result["MAX_PARALLEL_ENCODES"], "4")
 
+    def test_set_setting_overwrite_updates_row_in_place(self):
+        database.set_setting("MAX_PARALLEL_ENCODES", "2")
+        database.set_setting("VIDEO_BITRATE", "4M")
+        conn = database._get_conn()
+        rowid = conn.execute(
+            "SELECT rowid FROM settings WHERE key = ?", ("MAX_PARALLEL_ENCODES",)
+        ).fetchone()[0]
+        database.set_setting("MAX_PARALLEL_ENCODES", "4")
+        new_rowid = conn.execute(
+            "SELECT rowid FROM settings WHERE key = ?", ("MAX_PARALLEL_ENCODES",)
+        ).fetchone()[0]
+        self.assertEqual(new_rowid, rowid)
+
     def test_set_settings_bulk(self):
         database.set_settings({"VIDEO_BITRATE": "4M", "AUDIO_BITRATE": "128k"})
         result = database.get_all_settings()
@@ -1255,6 +1433,11 @@ class TestSettingsCRUD(TestDatabaseBase):
     def test_delete_nonexistent_setting_does_not_raise(self):
         database.delete_setting("NONEXISTENT_KEY")  # should not raise
 
+    def test_delete_settings_removes_all_given_keys(self):
+        database.set_settings({"VIDEO_BITRATE": "4M", "AUDIO_BITRATE": "128k", "HLS_SEGMENT_DURATION": "8"})
+        database.delete_settings(["VIDEO_BITRATE", "AUDIO_BITRATE", "NONEXISTENT_KEY"])
+        self.assertEqual(database.get_all_settings(), {"HLS_SEGMENT_DURATION": "8"})
+
 
 class TestBotsCRUD(TestDatabaseBase):
     def test_get_all_bots_empty(self):
@@ -383,13 +383,19 @@ class TestTelegramUploader(unittest.IsolatedAsyncioTestCase):
                     result[k] = tu.UploadedSegment(f"id-{k}", idx % 2, os.path.basename(p), 10)
                 return result
 
-            with patch.object(self.uploader, "upload_files", side_effect=fake_upload_files):
+            with patch.object(self.uploader, "upload_files", side_effect=fake_upload_files) as upload_files:
                 updates = []
                 result = await self.uploader.upload_job(proc, lambda c, t, n: updates.append((c, t, n)))
 
             self.assertEqual(result.total_files, 3)
             self.assertEqual(result.total_bytes, 30)
             self.assertEqual(len(updates), 3)
+            self.assertEqual([total for _, total, _ in updates], [3, 3, 3])
+            upload_files.assert_called_once()
+            self.assertEqual(
+                [key for key, _ in upload_files.call_args.args[0]],
+                ["video_0/video_0001.ts", "audio_0/audio_0001.ts", "sub_0/subtitles.vtt"],
+            )
 
     async def test_upload_job_no_callback(self):
         with tempfile.TemporaryDirectory() as root:
@@ -415,6 +421,40 @@ class TestTelegramUploader(unittest.IsolatedAsyncioTestCase):
 
             self.assertEqual(result.total_files, 1)
 
+    async def test_upload_job_persists_bot_index_only_when_counter_moves(self):
+        with tempfile.TemporaryDirectory() as root:
+            video_dir = os.path.join(root, "video_0")
+            os.makedirs(video_dir, exist_ok=True)
+            with open(os.path.join(video_dir, "video_0001.ts"), "wb") as fh:
+                fh.write(b"x")
+
+            proc = Mock(
+                job_id="jobpersist",
+                output_dir=root,
+                video_playlists=[(os.path.join(video_dir, "video.m3u8"), video_dir, 1280, 720, "2M")],
+                audio_playlists=[],
+                subtitle_files=[],
+            )
+            advance = False
+
+            async def fake_upload_files(files, cb=None, cancel_event=None):
+                if advance:
+                    self.uploader._next_bot()
+                return {k: tu.UploadedSegment("id", 0, "f", 1) for k, _ in files}
+
+            with patch.object(self.uploader, "upload_files", side_effect=fake_upload_files), \
+                    patch("database.set_last_bot_index") as persist:
+                await self.uploader.upload_job(proc)
+                persist.assert_not_called()
+
+                advance = True
+                await self.uploader.upload_job(proc)
+                persist.assert_called_once()
+
+                advance = False
+                await self.uploader.upload_job(proc)
+                persist.assert_called_once()
+
     # ─── upload_document ───
 
     async def test_upload_document_uses_first_bot(self):
@@ -6,6 +6,7 @@ For each input file, produces:
   - One WebVTT file per subtitle track
 """
 
+import collections
 import concurrent.futures
 import glob as _glob
 import logging
@@ -75,12 +76,13 @@ def _detect_hw_encoder():
         return None
 
     result = {"h264": None, "hevc": None}
+    encoders = _list_ffmpeg_encoders()
 
-    if _encoder_list_contains(h264_name) and _probe_hw_encoder(h264_name, enc_flags):
+    if h264_name in encoders and _probe_hw_encoder(h264_name, enc_flags):
         logger.info("Using hardware h264 encoder: %s", h264_name)
         result["h264"] = (h264_name, enc_flags)
 
-    if _encoder_list_contains(hevc_name) and _probe_hw_encoder(hevc_name, enc_flags):
+    if hevc_name in encoders and _probe_hw_encoder(hevc_name, enc_flags):
         logger.info("Using hardware hevc encoder: %s", hevc_name)
         result["hevc"] = (hevc_name, enc_flags)
 
@@ -92,7 +94,8 @@ def _detect_hw_encoder():
     return _hw_encoder_cache
 
 
-def _encoder_list_contains(enc_name):
+def _list_ffmpeg_encoders():
+    """Return FFmpeg's ``-encoders`` listing, or an empty string if it is unavailable."""
     try:
         result = subprocess.run(
             ["ffmpeg", "-hide_banner", "-encoders"],
@@ -101,9 +104,9 @@ def _encoder_list_contains(enc_name):
             timeout=10,
         )
     except Exception as exc:
-        logger.warning("Failed to list FFmpeg encoders while probing %s: %s", enc_name, exc)
-        return False
-    return result.returncode == 0 and enc_name in result.stdout
+        logger.warning("Failed to list FFmpeg encoders: %s", exc)
+        return ""
+    return result.stdout if result.returncode == 0 else ""
 
 
 def _probe_hw_encoder(enc_name, enc_flags):
@@ -151,10 +154,8 @@ def _get_tier0_bitrate(source_height):
     Picks the highest configured threshold that doesn't exceed the source height.
     Falls back to TIER0_BITRATE_DEFAULT for unlisted resolutions.
     """
-    best = None
-    for threshold in sorted(Config.TIER0_BITRATES.keys()):
-        if threshold <= source_height:
-            best = Config.TIER0_BITRATES[threshold]
+    threshold = max((t for t in Config.TIER0_BITRATES if t <= source_height), default=None)
+    best = Config.TIER0_BITRATES[threshold] if threshold is not None else None
     return best or Config.TIER0_BITRATE_DEFAULT
 
 
@@ -392,25 +393,27 @@ def _run_ffmpeg(cmd, description="", cancel_event=None, on_process_start=None, o
     logger.info("Running FFmpeg: %s", description)
     logger.debug("Command: %s", " ".join(cmd))
 
+    # Outputs go to files, so stdout is discarded, and -nostats keeps the
+    # captured stderr down to warnings and errors instead of per-frame stats.
     proc = None
     try:
         proc = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
+            cmd[:1] + ["-nostats"] + cmd[1:],
+            stdout=subprocess.DEVNULL,
             stderr=subprocess.PIPE,
             text=True,
         )
         if on_process_start:
             on_process_start(proc)
-        deadline = time.time() + 7200
+        deadline = time.monotonic() + 7200
         while True:
             if cancel_event and cancel_event.is_set():
                 _stop_ffmpeg_process(proc, description)
-            if time.time() > deadline:
+            if time.monotonic() > deadline:
                 proc.kill()
                 raise RuntimeError(f"FFmpeg timed out: {description}")
             try:
-                stdout, stderr = proc.communicate(timeout=0.2)
+                _, stderr = proc.communicate(timeout=0.2)
                 break
             except subprocess.TimeoutExpired:
                 continue
@@ -467,14 +470,18 @@ def _run_ffmpeg_with_progress(
 
     # Cap stderr to last 200 lines to prevent unbounded memory growth
     _STDERR_MAX_LINES = 200
-    stderr_chunks = []
+    stderr_chunks = collections.deque(maxlen=_STDERR_MAX_LINES)
+    stderr_lock = threading.Lock()
     stdout_exception = []
 
     def _read_stderr():
         for line in proc.stderr:
-            stderr_chunks.append(line)
-            if len(stderr_chunks) > _STDERR_MAX_LINES:
-                stderr_chunks.pop(0)
+            with stderr_lock:
+                stderr_chunks.append(line)
+
+    def _stderr_tail():
+        with stderr_lock:
+            return "".join(stderr_chunks)
 
     def _read_stdout():
         try:
@@ -499,18 +506,18 @@ def _run_ffmpeg_with_progress(
     stderr_thread.start()
     stdout_thread.start()
 
+    timed_out = False
     try:
-        deadline = time.time() + 7200
+        deadline = time.monotonic() + 7200
         while True:
             if cancel_event and cancel_event.is_set():
                 _stop_ffmpeg_process(proc, description)
             if proc.poll() is not None:
                 break
-            if time.time() > deadline:
+            if time.monotonic() > deadline:
                 proc.kill()
-                stderr_output = "".join(stderr_chunks)
-                logger.error("FFmpeg with progress timed out for %s:\n%s", description, stderr_output[-2000:])
-                raise RuntimeError(f"FFmpeg timed out: {description}")
+                timed_out = True
+                break
             time.sleep(0.1)
     finally:
         stderr_thread.join(timeout=5)
@@ -518,11 +525,18 @@ def _run_ffmpeg_with_progress(
         if on_process_end:
             on_process_end(proc)
 
+    # The joins above can time out with the stderr reader still running, so the
+    # tail is always snapshotted under its lock.
+    if timed_out:
+        stderr_output = _stderr_tail()
+        logger.error("FFmpeg with progress timed out for %s:\n%s", description, stderr_output[-2000:])
+        raise RuntimeError(f"FFmpeg timed out: {description}")
+
     if stdout_exception:
         logger.warning("Error reading FFmpeg progress: %s", stdout_exception[0])
 
     if proc.returncode != 0:
-        stderr_output = "".join(stderr_chunks)
+        stderr_output = _stderr_tail()
         logger.error("FFmpeg failed for %s:\n%s", description, stderr_output[-2000:])
         raise RuntimeError(f"FFmpeg failed: {description}\n{stderr_output[-2000:]}")
 
@@ -556,7 +570,8 @@ def _parse_segment_durations(playlist_path):
     segment_dir = os.path.dirname(playlist_path)
     durations = {}
     try:
-        ts_files = sorted(f for f in os.listdir(segment_dir) if f.endswith(".ts"))
+        # Results are keyed by name and collected as probes finish, so no sort is needed.
+        ts_files = [f for f in os.listdir(segment_dir) if f.endswith(".ts")]
     except OSError as e:
         logger.warning("Failed to list segments in %s: %s", segment_dir, e)
         return durations
@@ -591,22 +606,26 @@ def _check_segment_sizes(segment_dir):
     """
     oversized = []
     try:
-        for filename in sorted(os.listdir(segment_dir)):
-            if not filename.endswith(".ts"):
-                continue
-            filepath = os.path.join(segment_dir, filename)
-            try:
-                size = os.path.getsize(filepath)
-            except OSError:
-                continue
-            if size > Config.TELEGRAM_MAX_FILE_SIZE:
-                oversized.append((filename, size))
-                logger.warning(
-                    "Segment %s is %d bytes — exceeds Telegram limit of %d bytes",
-                    filepath, size, Config.TELEGRAM_MAX_FILE_SIZE,
-                )
+        with os.scandir(segment_dir) as entries:
+            ts_entries = sorted(
+                (entry for entry in entries if entry.name.endswith(".ts")),
+                key=lambda entry: entry.name,
+            )
     except OSError as e:
         logger.warning("Could not scan segment dir %s: %s", segment_dir, e)
+        return oversized
+
+    for entry in ts_entries:
+        try:
+            size = entry.stat().st_size
+        except OSError:
+            continue
+        if size > Config.TELEGRAM_MAX_FILE_SIZE:
+            oversized.append((entry.name, size))
+            logger.warning(
+                "Segment %s is %d bytes — exceeds Telegram limit of %d bytes",
+                entry.path, size, Config.TELEGRAM_MAX_FILE_SIZE,
+            )
     return oversized
 
 
@@ -928,7 +947,9 @@ def process(
                 on_process_end=on_process_end,
             )
             tier_dir = os.path.dirname(playlist)
-            _check_segment_sizes(tier_dir)
+            if not allow_copy:
+                # Copy mode checks this directory itself and re-encodes oversized segments.
+                _check_segment_sizes(tier_dir)
             seg_durations = _parse_segment_durations(playlist)
             return (tier_index, playlist, tier_dir, width, height, bitrate, seg_durations, label)
 
@@ -946,11 +967,23 @@ def process(
             _, _, tier_dir, _, _, _, seg_durations, _ = tier_0_result
             oversized = _check_segment_sizes(tier_dir)
             if oversized:
+                # Segments are independent, so re-encode them in parallel under
+                # the same cap as tier encodes.
                 source_codec = analysis.video_streams[0].codec_name
-                for seg_file, _seg_size in oversized:
-                    seg_path = os.path.join(tier_dir, seg_file)
-                    seg_duration = seg_durations.get(seg_file)
-                    _reencode_oversized_segment(seg_path, seg_duration, hw_encoder, source_codec)
+                max_workers = min(len(oversized), Config.MAX_PARALLEL_ENCODES)
+                with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    futures = [
+                        executor.submit(
+                            _reencode_oversized_segment,
+                            os.path.join(tier_dir, seg_file),
+                            seg_durations.get(seg_file),
+                            hw_encoder,
+                            source_codec,
+                        )
+                        for seg_file, _seg_size in oversized
+                    ]
+                    for future in concurrent.futures.as_completed(futures):
+                        future.result()
 
             if on_stream_encoded:
                 ts_files = [